@@ -0,0 +1,108 @@
+#lib
+import os
+import json
+import zlib
+import struct
+import argparse
+
+
+# ---------------- Archive format ----------------
+# A single file holding every Pulse JSON document:
+#
+#   header  : magic (8 bytes) + index offset (8) + index length (8)
+#   blobs   : one zlib compressed JSON document per (dataset, state, year, quarter),
+#             grouped by dataset so one dataset is a single contiguous range
+#   index   : zlib compressed JSON list of [dataset, state, year, quarter, offset, length]
+
+MAGIC = b"PPACK01\0"
+HEADER = struct.Struct("<8sQQ")
+
+
+def walk_dataset(root):
+    # Yields (state, year, quarter, path) for one dataset folder of the pulse tree
+    for state in sorted(os.listdir(root)):
+        cur_state = os.path.join(root, state)
+        for year in sorted(os.listdir(cur_state)):
+            cur_year = os.path.join(cur_state, year)
+            for file in sorted(os.listdir(cur_year)):
+                if file.endswith(".json"):
+                    yield state, int(year), int(file[:-len(".json")]), os.path.join(cur_year, file)
+
+
+def pack(data_root, datasets, out_path, level=6):
+    # datasets maps a dataset name to its folder relative to data_root
+    index = []
+    tmp = out_path + ".tmp"
+    with open(tmp, "wb") as out:
+        out.write(HEADER.pack(MAGIC, 0, 0))
+        for dataset, rel_path in datasets.items():
+            for state, year, quarter, path in walk_dataset(os.path.join(data_root, rel_path)):
+                with open(path, "rb") as f:
+                    # Re-serialize compactly; the source files are pretty printed
+                    raw = json.dumps(json.load(f), separators=(",", ":")).encode("utf-8")
+                blob = zlib.compress(raw, level)
+                index.append([dataset, state, year, quarter, out.tell(), len(blob)])
+                out.write(blob)
+        index_offset = out.tell()
+        index_blob = zlib.compress(json.dumps(index).encode("utf-8"), level)
+        out.write(index_blob)
+        out.seek(0)
+        out.write(HEADER.pack(MAGIC, index_offset, len(index_blob)))
+    os.replace(tmp, out_path)
+    return len(index)
+
+
+class PulseArchive:
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            magic, index_offset, index_length = HEADER.unpack(f.read(HEADER.size))
+            if magic != MAGIC:
+                raise ValueError(f"{path} is not a Pulse archive")
+            f.seek(index_offset)
+            entries = json.loads(zlib.decompress(f.read(index_length)))
+        self.index = {}
+        self.by_dataset = {}
+        for dataset, state, year, quarter, offset, length in entries:
+            self.index[(dataset, state, year, quarter)] = (offset, length)
+            self.by_dataset.setdefault(dataset, []).append((state, year, quarter, offset, length))
+
+    def datasets(self):
+        return list(self.by_dataset)
+
+    def entries(self, dataset):
+        return [(state, year, quarter) for state, year, quarter, _, _ in self.by_dataset.get(dataset, [])]
+
+    def read(self, dataset, state, year, quarter):
+        offset, length = self.index[(dataset, state, year, quarter)]
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            return json.loads(zlib.decompress(f.read(length)))
+
+    def iter_documents(self, dataset):
+        # One sequential read of the dataset's range, then decompress entry by entry
+        entries = self.by_dataset.get(dataset, [])
+        if not entries:
+            return
+        start = entries[0][3]
+        end = entries[-1][3] + entries[-1][4]
+        with open(self.path, "rb") as f:
+            f.seek(start)
+            block = f.read(end - start)
+        for state, year, quarter, offset, length in entries:
+            raw = block[offset - start:offset - start + length]
+            yield state, year, quarter, json.loads(zlib.decompress(raw))
+
+
+if __name__ == "__main__":
+    from phonepe_etl import DATA_ROOT, DATASETS
+
+    parser = argparse.ArgumentParser(description="Pack the pulse/data tree into one indexed archive")
+    parser.add_argument("out", help="archive file to write, e.g. pulse.ppack")
+    parser.add_argument("--data-root", default=DATA_ROOT)
+    parser.add_argument("--datasets", nargs="*", choices=list(DATASETS))
+    args = parser.parse_args()
+
+    names = args.datasets or list(DATASETS)
+    count = pack(args.data_root, {d: DATASETS[d]["path"] for d in names}, args.out)
+    print(f"Packed {count} files into {args.out} ({os.path.getsize(args.out) / 1e6:.1f} MB)")
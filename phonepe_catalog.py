@@ -0,0 +1,85 @@
+#lib
+import pandas as pd
+
+
+# ---------------- Data catalog ----------------
+# The ETL keeps two small tables up to date after every load:
+#
+#   data_catalog        one row per (table, year, quarter) that has data, with its row count
+#   data_catalog_stats  row count and min/max of every measure column per table
+#
+# The dashboard fills its year/quarter selectors from them and skips queries
+# for periods a table does not have.
+
+MEASURE_TYPES = ("bigint", "float")
+
+
+def catalog_stage(datasets, ckpt):
+    from phonepe_etl import DATASETS, get_connection
+
+    conn = get_connection()
+    periods = 0
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("""CREATE TABLE IF NOT EXISTS data_catalog (
+                                  Table_name varchar(64),
+                                  Years int,
+                                  Quarter int,
+                                  Row_count bigint)""")
+            cursor.execute("""CREATE TABLE IF NOT EXISTS data_catalog_stats (
+                                  Table_name varchar(64),
+                                  Measure varchar(64),
+                                  Row_count bigint,
+                                  Min_value float,
+                                  Max_value float)""")
+            for dataset in datasets:
+                spec = DATASETS[dataset]
+                cursor.execute("DELETE FROM data_catalog WHERE Table_name = %s", (dataset,))
+                cursor.execute(f"""INSERT INTO data_catalog (Table_name, Years, Quarter, Row_count)
+                                   SELECT %s, Years, Quarter, COUNT(*)
+                                   FROM {dataset}
+                                   GROUP BY Years, Quarter""", (dataset,))
+                periods += cursor.rowcount
+
+                cursor.execute("DELETE FROM data_catalog_stats WHERE Table_name = %s", (dataset,))
+                measures = [c for c, t in zip(spec["columns"], spec["types"]) if t in MEASURE_TYPES]
+                for measure in measures:
+                    cursor.execute(f"""INSERT INTO data_catalog_stats (Table_name, Measure, Row_count, Min_value, Max_value)
+                                       SELECT %s, %s, COUNT(*), MIN({measure}), MAX({measure})
+                                       FROM {dataset}""", (dataset, measure.lower()))
+        conn.commit()
+    finally:
+        conn.close()
+    return {"periods": periods}
+
+
+# ---------------- Dashboard lookups ----------------
+
+def load_catalog(run_query):
+    # run_query is phonepe_db.run_query, so the catalog sits in the result cache
+    try:
+        return run_query("SELECT table_name, years, quarter, row_count FROM data_catalog ORDER BY table_name, years, quarter")
+    except Exception:
+        return pd.DataFrame(columns=["table_name", "years", "quarter", "row_count"])
+
+
+def available_years(catalog, table, fallback):
+    years = catalog.loc[catalog["table_name"] == table, "years"].unique().tolist()
+    return sorted(int(y) for y in years) or fallback
+
+
+def available_quarters(catalog, table, year, fallback=(1, 2, 3, 4)):
+    rows = catalog[(catalog["table_name"] == table) & (catalog["years"] == year)]
+    return sorted(int(q) for q in rows["quarter"].unique()) or list(fallback)
+
+
+def has_partition(catalog, table, year=None, quarter=None):
+    # A table the catalog does not know about (ETL not run since it was added) never blocks a query
+    rows = catalog[catalog["table_name"] == table]
+    if rows.empty:
+        return True
+    if year is not None:
+        rows = rows[rows["years"] == int(year)]
+    if quarter is not None:
+        rows = rows[rows["quarter"] == int(quarter)]
+    return not rows.empty
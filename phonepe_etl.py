@@ -0,0 +1,677 @@
+#lib
+import os
+import re
+import json
+import time
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import psycopg2
+from psycopg2.extras import execute_values
+
+from phonepe_archive import PulseArchive, walk_dataset
+from phonepe_forecast import forecast_stage
+from phonepe_catalog import catalog_stage
+from phonepe_prerender import prerender_stage
+from phonepe_sketch import sketch_stage
+from phonepe_geo import geometry_stage
+from phonepe_metrics import registry, start_http_server
+from phonepe_profile import profiler
+from phonepe_db import LIVE_SCHEMA
+
+
+# ---------------- Configuration ----------------
+# Root of a local clone of https://github.com/PhonePe/pulse (the "data" folder)
+DATA_ROOT = os.environ.get("PULSE_DATA_ROOT", "C:/Users/User/Downloads/phonepe clone/pulse/data/")
+
+# Optional packed archive built by phonepe_archive.py; when set it replaces DATA_ROOT
+ARCHIVE_PATH = os.environ.get("PULSE_ARCHIVE")
+
+# Where per-dataset checkpoints of a run are kept so a failed run can resume
+CHECKPOINT_DIR = os.environ.get("PULSE_CHECKPOINT_DIR", ".etl_checkpoints")
+
+DB_PARAMS = {
+    "host": "localhost",
+    "user": "postgres",
+    "password": "Edison",
+    "database": "phonepe",
+    "port": "5432",
+}
+
+
+# Every run loads into a shadow schema and publish swaps it in as LIVE_SCHEMA in
+# one transaction, so the dashboard never reads a half-loaded table and never
+# waits on ETL writes. The replaced schema is kept as RETIRED_SCHEMA until the
+# next publish so queries still running on it can finish.
+STAGING_SCHEMA = "pulse_staging"
+RETIRED_SCHEMA = "pulse_retired"
+
+
+def get_connection(schema=STAGING_SCHEMA):
+    # ETL connections read and write the shadow schema unless told otherwise
+    return psycopg2.connect(**DB_PARAMS, options=f"-c search_path={schema}")
+
+
+# ---------------- Parsers ----------------
+# Each parser takes one Pulse JSON document and returns the dataset specific
+# part of every row. States, Years and Quarter are added by the parse stage.
+
+def parse_aggregated_payments(doc):
+    rows = []
+    for i in doc["data"]["transactionData"] or []:
+        rows.append((i["name"],
+                     i["paymentInstruments"][0]["count"],
+                     i["paymentInstruments"][0]["amount"]))
+    return rows
+
+
+def parse_aggregated_user(doc):
+    # usersByDevice is null for the quarters PhonePe did not publish brands
+    rows = []
+    for i in doc["data"].get("usersByDevice") or []:
+        rows.append((i["brand"], i["count"], i["percentage"]))
+    return rows
+
+
+def parse_map_payments(doc):
+    rows = []
+    for i in doc["data"]["hoverDataList"] or []:
+        rows.append((i["name"], i["metric"][0]["count"], i["metric"][0]["amount"]))
+    return rows
+
+
+def parse_map_user(doc):
+    rows = []
+    for district, values in (doc["data"]["hoverData"] or {}).items():
+        rows.append((district, values["registeredUsers"], values["appOpens"]))
+    return rows
+
+
+def to_pincode(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_top_payments(doc):
+    # The pincode list does not say which district a pincode belongs to
+    rows = []
+    for i in doc["data"]["pincodes"] or []:
+        rows.append((None, i["metric"]["count"], i["metric"]["amount"], to_pincode(i["entityName"])))
+    return rows
+
+
+def parse_top_user(doc):
+    # Top user files only publish registered users, not app opens
+    rows = []
+    for i in doc["data"]["pincodes"] or []:
+        rows.append((to_pincode(i["name"]), i["registeredUsers"], None))
+    return rows
+
+
+# ---------------- Datasets ----------------
+# transaction / insurance / user x aggregated / map / top, same tables as the notebook
+
+DATASETS = {
+    "aggregated_insurance": {
+        "path": "aggregated/insurance/country/india/state/",
+        "parser": parse_aggregated_payments,
+        "columns": ["States", "Years", "Quarter", "Insurance_type", "Transaction_count", "Transaction_amount"],
+        "types": ["varchar(255)", "int", "int", "varchar(255)", "bigint", "bigint"],
+    },
+    "aggregated_transaction": {
+        "path": "aggregated/transaction/country/india/state/",
+        "parser": parse_aggregated_payments,
+        "columns": ["States", "Years", "Quarter", "Transaction_type", "Transaction_count", "Transaction_amount"],
+        "types": ["varchar(255)", "int", "int", "varchar(255)", "bigint", "bigint"],
+    },
+    "aggregated_user": {
+        "path": "aggregated/user/country/india/state/",
+        "parser": parse_aggregated_user,
+        "columns": ["States", "Years", "Quarter", "Brands", "Transaction_count", "Percentage"],
+        "types": ["varchar(255)", "int", "int", "varchar(255)", "bigint", "float"],
+    },
+    "map_insurance": {
+        "path": "map/insurance/hover/country/india/state/",
+        "parser": parse_map_payments,
+        "columns": ["States", "Years", "Quarter", "Districts", "Transaction_count", "Transaction_amount"],
+        "types": ["varchar(255)", "int", "int", "varchar(255)", "bigint", "bigint"],
+    },
+    "map_transaction": {
+        "path": "map/transaction/hover/country/india/state/",
+        "parser": parse_map_payments,
+        "columns": ["States", "Years", "Quarter", "Districts", "Transaction_count", "Transaction_amount"],
+        "types": ["varchar(255)", "int", "int", "varchar(255)", "bigint", "bigint"],
+    },
+    "map_user": {
+        "path": "map/user/hover/country/india/state/",
+        "parser": parse_map_user,
+        "columns": ["States", "Years", "Quarter", "Districts", "Registered_user", "App_opens"],
+        "types": ["varchar(255)", "int", "int", "varchar(255)", "bigint", "bigint"],
+    },
+    "top_insurance": {
+        "path": "top/insurance/country/india/state/",
+        "parser": parse_top_payments,
+        "columns": ["States", "Years", "Quarter", "Districts", "Transaction_count", "Transaction_amount", "Pincodes"],
+        "types": ["varchar(255)", "int", "int", "varchar(255)", "bigint", "bigint", "int"],
+    },
+    "top_transaction": {
+        "path": "top/transaction/country/india/state/",
+        "parser": parse_top_payments,
+        "columns": ["States", "Years", "Quarter", "Districts", "Transaction_count", "Transaction_amount", "Pincodes"],
+        "types": ["varchar(255)", "int", "int", "varchar(255)", "bigint", "bigint", "int"],
+    },
+    "top_user": {
+        "path": "top/user/country/india/state/",
+        "parser": parse_top_user,
+        "columns": ["States", "Years", "Quarter", "Pincodes", "Registered_user", "App_opens"],
+        "types": ["varchar(255)", "int", "int", "int", "bigint", "bigint"],
+    },
+}
+
+
+# ---------------- Checkpoints ----------------
+# One manifest per run records which stages finished for every dataset.
+# Intermediate frames are pickled next to it so later stages can pick them up.
+# The manifest also records what the run loads (datasets and source): the
+# staging schema and the global stages are only valid for that, so resuming
+# with different datasets or another source starts a new run.
+
+class Checkpoint:
+    def __init__(self, directory=CHECKPOINT_DIR, run=None):
+        self.directory = directory
+        self.path = os.path.join(directory, "manifest.json")
+        self.lock = threading.Lock()
+        self.run = run or {}
+        os.makedirs(directory, exist_ok=True)
+        if os.path.exists(self.path):
+            with open(self.path, "r") as f:
+                self.manifest = json.load(f)
+        else:
+            self.manifest = {}
+        if self.manifest and not self.manifest.get("finished") and self.manifest.get("run") != self.run:
+            print(f"Checkpoints of run {self.manifest.get('run_id')} were for {self.manifest.get('run')}, starting over")
+            self.manifest = {}
+        if not self.manifest or self.manifest.get("finished"):
+            self.reset()
+
+    def reset(self):
+        # Only remove what the checkpoint wrote, the directory may be shared
+        for name in os.listdir(self.directory):
+            if name in ("manifest.json", "manifest.json.tmp") or name.endswith((".files.json", ".pkl")):
+                os.remove(os.path.join(self.directory, name))
+        self.manifest = {"run_id": time.strftime("%Y%m%d%H%M%S"), "run": self.run, "finished": False, "stages": {}}
+        self.save()
+
+    def save(self):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(tmp, self.path)
+
+    def done(self, key, stage):
+        with self.lock:
+            return stage in self.manifest["stages"].get(key, {})
+
+    def mark(self, key, stage, info=None):
+        with self.lock:
+            self.manifest["stages"].setdefault(key, {})[stage] = info or {}
+            self.save()
+
+    def frame_path(self, dataset, stage):
+        return os.path.join(self.directory, f"{dataset}.{stage}.pkl")
+
+    def finish(self):
+        with self.lock:
+            self.manifest["finished"] = True
+            self.save()
+
+
+# ---------------- Dataset stages ----------------
+
+def discover(dataset, spec, ckpt):
+    # List every state/year/quarter file of the dataset
+    if ARCHIVE_PATH:
+        files = [[state, year, quarter, None] for state, year, quarter in PulseArchive(ARCHIVE_PATH).entries(dataset)]
+    else:
+        files = [list(entry) for entry in walk_dataset(os.path.join(DATA_ROOT, spec["path"]))]
+    with open(os.path.join(ckpt.directory, f"{dataset}.files.json"), "w") as f:
+        json.dump(files, f)
+    return {"files": len(files), "source": ARCHIVE_PATH or DATA_ROOT}
+
+
+def iter_documents(dataset, files):
+    if ARCHIVE_PATH:
+        # Read and decode happen together inside the archive reader
+        docs = PulseArchive(ARCHIVE_PATH).iter_documents(dataset)
+        while True:
+            with profiler.section(dataset, "read+decode"):
+                item = next(docs, None)
+            if item is None:
+                return
+            yield item
+    for state, year, quarter, path in files:
+        with profiler.section(dataset, "read"):
+            with open(path, "r") as data:
+                text = data.read()
+        with profiler.section(dataset, "decode"):
+            doc = json.loads(text)
+        yield state, year, quarter, doc
+
+
+def parse(dataset, spec, ckpt):
+    with open(os.path.join(ckpt.directory, f"{dataset}.files.json"), "r") as f:
+        files = json.load(f)
+    rows = []
+    start = time.perf_counter()
+    for state, year, quarter, doc in iter_documents(dataset, files):
+        with profiler.section(dataset, "parser"):
+            for values in spec["parser"](doc):
+                rows.append((state, year, quarter) + tuple(values))
+        if profiler.enabled:
+            now = time.perf_counter()
+            profiler.file(dataset, f"{state}/{year}/{quarter}.json", now - start)
+            start = now
+    with profiler.section(dataset, "frame"):
+        df = pd.DataFrame(rows, columns=spec["columns"])
+    df.to_pickle(ckpt.frame_path(dataset, "parse"))
+    return {"rows": len(df), "files": len(files)}
+
+
+def clean_states(states):
+    # Same clean up the notebook applied to every table
+    states = states.str.replace("andaman-&-nicobar-islands", "Andaman & Nicobar")
+    states = states.str.replace("-", " ")
+    states = states.str.title()
+    states = states.str.replace("Dadra & Nagar Haveli & Daman & Diu", "Dadra and Nagar Haveli and Daman and Diu")
+    return states
+
+
+def normalize(dataset, spec, ckpt):
+    df = pd.read_pickle(ckpt.frame_path(dataset, "parse"))
+    with profiler.section(dataset, "clean_states"):
+        df["States"] = clean_states(df["States"])
+    df = df.astype(object).where(df.notna(), None)
+    df.to_pickle(ckpt.frame_path(dataset, "normalize"))
+    return {"rows": len(df)}
+
+
+# ---------------- Partitions ----------------
+# Every table is range-partitioned by Years, one partition per year named
+# <table>_<year>, each with a BRIN index on (Years, Quarter). A partition is
+# filled and indexed as a standalone table and then attached, so a query
+# filtered on a year only ever reads that year's partition.
+
+def create_table_sql(dataset, spec):
+    columns = ",\n    ".join(f"{c} {t}" for c, t in zip(spec["columns"], spec["types"]))
+    return f"CREATE TABLE IF NOT EXISTS {dataset} (\n    {columns})\nPARTITION BY RANGE (Years)"
+
+
+def partition_name(dataset, year):
+    return f"{dataset}_{int(year)}"
+
+
+def attach_partition(cursor, dataset, year):
+    # A CHECK matching the partition bound lets ATTACH skip its validation scan
+    name = partition_name(dataset, year)
+    cursor.execute(f"""ALTER TABLE {name} ADD CONSTRAINT {name}_bound
+                       CHECK (Years IS NOT NULL AND Years >= {int(year)} AND Years < {int(year) + 1})""")
+    cursor.execute(f"ALTER TABLE {dataset} ATTACH PARTITION {name} FOR VALUES FROM ({int(year)}) TO ({int(year) + 1})")
+    cursor.execute(f"ALTER TABLE {name} DROP CONSTRAINT {name}_bound")
+
+
+def load(dataset, spec, ckpt):
+    # Rebuild the whole table in one transaction so a retried load never duplicates rows
+    df = pd.read_pickle(ckpt.frame_path(dataset, "normalize"))
+    # Rows in period order keep every BRIN block range down to one or two quarters
+    df = df.sort_values(["Years", "Quarter"], kind="stable")
+    conn = get_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {dataset} CASCADE")
+            cursor.execute(create_table_sql(dataset, spec))
+            cursor.execute(f"CREATE INDEX {dataset}_period_idx ON {dataset} USING brin (Years, Quarter)")
+            for year, rows in df.groupby("Years", sort=True):
+                name = partition_name(dataset, year)
+                cursor.execute(f"CREATE TABLE {name} (LIKE {dataset})")
+                with profiler.section(dataset, "insert"):
+                    execute_values(cursor,
+                                   f"INSERT INTO {name} ({', '.join(spec['columns'])}) VALUES %s",
+                                   list(rows.itertuples(index=False, name=None)),
+                                   page_size=5000)
+                with profiler.section(dataset, "index+attach"):
+                    cursor.execute(f"CREATE INDEX {name}_period_idx ON {name} USING brin (Years, Quarter)")
+                    attach_partition(cursor, dataset, year)
+            with profiler.section(dataset, "commit"):
+                conn.commit()
+    finally:
+        conn.close()
+    return {"rows": len(df), "partitions": int(df["Years"].nunique())}
+
+
+DATASET_STAGES = [
+    ("discover", discover),
+    ("parse", parse),
+    ("normalize", normalize),
+    ("load", load),
+]
+
+
+# ---------------- Metrics ----------------
+
+stage_seconds = registry.histogram("pulse_etl_stage_seconds", "Wall time of each ETL stage",
+                                   buckets=(0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800))
+rows_total = registry.counter("pulse_etl_rows_total", "Rows handled per dataset and stage")
+files_total = registry.counter("pulse_etl_files_total", "Pulse JSON files parsed per dataset")
+rows_per_second = registry.gauge("pulse_etl_rows_per_second", "Rows/sec of the last run of a stage")
+files_per_second = registry.gauge("pulse_etl_files_per_second", "Files/sec of the last parse stage")
+
+
+def record_stage(dataset, stage, info):
+    seconds = info["seconds"]
+    stage_seconds.observe(seconds, dataset=dataset, stage=stage)
+    if "rows" in info:
+        rows_total.inc(info["rows"], dataset=dataset, stage=stage)
+        rows_per_second.set(round(info["rows"] / max(seconds, 1e-9), 1), dataset=dataset, stage=stage)
+    if stage == "parse":
+        files_total.inc(info["files"], dataset=dataset)
+        files_per_second.set(round(info["files"] / max(seconds, 1e-9), 1), dataset=dataset)
+
+
+def run_dataset(dataset, ckpt):
+    spec = DATASETS[dataset]
+    for stage, func in DATASET_STAGES:
+        if ckpt.done(dataset, stage):
+            continue
+        start = time.perf_counter()
+        with profiler.stage(dataset, stage):
+            info = func(dataset, spec, ckpt)
+        info["seconds"] = round(time.perf_counter() - start, 3)
+        ckpt.mark(dataset, stage, info)
+        record_stage(dataset, stage, info)
+        print(f"[{dataset}] {stage} done {info}")
+
+
+# ---------------- Global stages ----------------
+# These need every dataset loaded and run once, in order, after the dataset stages.
+
+def create_indexes(cursor, table):
+    # On a partitioned parent these cascade to every partition, reusing a
+    # partition's matching index where one already exists
+    cursor.execute(f"CREATE INDEX IF NOT EXISTS {table}_period_idx ON {table} USING brin (Years, Quarter)")
+    cursor.execute(f"CREATE INDEX IF NOT EXISTS {table}_states_idx ON {table} (States)")
+
+
+def rollup_index(datasets, ckpt):
+    conn = get_connection()
+    try:
+        with conn.cursor() as cursor:
+            for dataset in datasets:
+                create_indexes(cursor, dataset)
+                cursor.execute(f"ANALYZE {dataset}")
+        conn.commit()
+    finally:
+        conn.close()
+    return {}
+
+
+def brand_pivot(datasets, ckpt):
+    # state x period x brand pivot of aggregated_user, with share, rank and the
+    # previous quarter's share/rank so the dashboard never groups the raw table.
+    # States = 'India' holds the national totals. Brands that left since the
+    # previous quarter have no row; their share is 1 - SUM(Prev_share).
+    if "aggregated_user" not in datasets:
+        return {"skipped": True}
+    conn = get_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("DROP TABLE IF EXISTS brand_pivot")
+            cursor.execute("""CREATE TABLE brand_pivot AS
+                              WITH base AS (
+                                  SELECT States, Years, Quarter, Brands, SUM(Transaction_count) AS Users
+                                  FROM aggregated_user
+                                  GROUP BY States, Years, Quarter, Brands
+                                  UNION ALL
+                                  SELECT 'India', Years, Quarter, Brands, SUM(Transaction_count)
+                                  FROM aggregated_user
+                                  GROUP BY Years, Quarter, Brands
+                              ), shares AS (
+                                  SELECT *,
+                                         Users::float / NULLIF(SUM(Users) OVER (PARTITION BY States, Years, Quarter), 0) AS Share,
+                                         RANK() OVER (PARTITION BY States, Years, Quarter ORDER BY Users DESC) AS Brand_rank
+                                  FROM base
+                              ), periods AS (
+                                  SELECT DISTINCT States, Years, Quarter FROM base
+                              )
+                              -- Previous = the calendar quarter before, not the brand's previous row.
+                              -- A brand missing there had a share of 0; Prev_share stays NULL only
+                              -- when the state has no data for the previous quarter at all.
+                              SELECT s.*,
+                                     CASE WHEN pp.States IS NOT NULL THEN COALESCE(p.Share, 0) END AS Prev_share,
+                                     p.Brand_rank AS Prev_rank
+                              FROM shares s
+                              LEFT JOIN periods pp
+                                     ON pp.States = s.States AND pp.Years * 4 + pp.Quarter = s.Years * 4 + s.Quarter - 1
+                              LEFT JOIN shares p
+                                     ON p.States = s.States AND p.Brands = s.Brands
+                                    AND p.Years * 4 + p.Quarter = s.Years * 4 + s.Quarter - 1""")
+            cursor.execute("CREATE INDEX brand_pivot_idx ON brand_pivot (States, Years, Quarter)")
+            cursor.execute("ANALYZE brand_pivot")
+            cursor.execute("SELECT COUNT(*) FROM brand_pivot")
+            rows = cursor.fetchone()[0]
+        conn.commit()
+    finally:
+        conn.close()
+    return {"rows": rows}
+
+
+def live_partitions(cursor, table):
+    cursor.execute("""SELECT c.relname FROM pg_inherits i
+                      JOIN pg_class c ON c.oid = i.inhrelid
+                      JOIN pg_class p ON p.oid = i.inhparent
+                      JOIN pg_namespace n ON n.oid = p.relnamespace
+                      WHERE n.nspname = %s AND p.relname = %s""", (LIVE_SCHEMA, table))
+    return [name for (name,) in cursor.fetchall()]
+
+
+def prepare_staging(datasets, ckpt):
+    # Fresh shadow schema; live tables this run does not reload (other datasets,
+    # data_version, derived tables) are copied over so the swap keeps them
+    conn = get_connection()
+    copied = []
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(f"DROP SCHEMA IF EXISTS {STAGING_SCHEMA} CASCADE")
+            cursor.execute(f"CREATE SCHEMA {STAGING_SCHEMA}")
+            cursor.execute("""SELECT c.relname, c.relkind FROM pg_class c
+                              JOIN pg_namespace n ON n.oid = c.relnamespace
+                              WHERE n.nspname = %s AND c.relkind IN ('r', 'p') AND NOT c.relispartition""",
+                           (LIVE_SCHEMA,))
+            for table, kind in cursor.fetchall():
+                if table in datasets:
+                    continue
+                if kind == "p":
+                    # Partitioned: same layout, each year copied and attached
+                    # Parent indexes exist before the attach, so each copied
+                    # partition's indexes become their children
+                    cursor.execute(create_table_sql(table, DATASETS[table]))
+                    create_indexes(cursor, table)
+                    for name in live_partitions(cursor, table):
+                        cursor.execute(f"CREATE TABLE {name} (LIKE {LIVE_SCHEMA}.{name} INCLUDING INDEXES)")
+                        cursor.execute(f"INSERT INTO {name} SELECT * FROM {LIVE_SCHEMA}.{name}")
+                        attach_partition(cursor, table, int(name.rsplit("_", 1)[1]))
+                    cursor.execute(f"ANALYZE {table}")
+                else:
+                    cursor.execute(f"CREATE TABLE {STAGING_SCHEMA}.{table} (LIKE {LIVE_SCHEMA}.{table} INCLUDING INDEXES)")
+                    cursor.execute(f"INSERT INTO {STAGING_SCHEMA}.{table} SELECT * FROM {LIVE_SCHEMA}.{table}")
+                copied.append(table)
+        conn.commit()
+    finally:
+        conn.close()
+    return {"copied": copied}
+
+
+def swap_schemas(cursor):
+    # Renames only touch the catalog, so this commits in milliseconds; readers
+    # resolve table names again on their next query and land on the new schema
+    cursor.execute("SET LOCAL lock_timeout = '10s'")
+    cursor.execute(f"DROP SCHEMA IF EXISTS {RETIRED_SCHEMA} CASCADE")
+    cursor.execute("SELECT 1 FROM pg_namespace WHERE nspname = %s", (LIVE_SCHEMA,))
+    if cursor.fetchone():
+        cursor.execute(f"ALTER SCHEMA {LIVE_SCHEMA} RENAME TO {RETIRED_SCHEMA}")
+    cursor.execute(f"ALTER SCHEMA {STAGING_SCHEMA} RENAME TO {LIVE_SCHEMA}")
+
+
+def publish_version(datasets, ckpt):
+    # The dashboard keys its caches on the latest row of data_version (phonepe_db.data_version).
+    # The version row and the swap commit together, so a version always names what is live.
+    info = {d: ckpt.manifest["stages"][d]["load"] for d in datasets}
+    conn = get_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("""CREATE TABLE IF NOT EXISTS data_version (
+                                  Version int PRIMARY KEY,
+                                  Run_id varchar(32),
+                                  Published_at timestamp,
+                                  Datasets text)""")
+            cursor.execute("""INSERT INTO data_version (Version, Run_id, Published_at, Datasets)
+                              SELECT COALESCE(MAX(Version), 0) + 1, %s, now(), %s FROM data_version
+                              RETURNING Version""",
+                           (ckpt.manifest["run_id"], json.dumps(info)))
+            version = cursor.fetchone()[0]
+            swap_schemas(cursor)
+        conn.commit()
+    finally:
+        conn.close()
+    return {"version": version, "schema": LIVE_SCHEMA}
+
+
+GLOBAL_STAGES = [
+    ("rollup_index", rollup_index),
+    ("catalog", catalog_stage),
+    ("brand_pivot", brand_pivot),
+    ("pincode_sketch", sketch_stage),
+    ("forecast", forecast_stage),
+    ("publish", publish_version),
+    ("prerender", prerender_stage),
+    ("geometry", geometry_stage),
+]
+
+
+# ---------------- Partition pruning check ----------------
+# EXPLAINs the year/quarter filtered queries of Scenarios 4 and 5 plus a
+# period filter on every table, against the live schema, and fails if a plan
+# reads any partition other than the selected year's.
+
+def plan_relations(plan):
+    names = [plan["Relation Name"]] if "Relation Name" in plan else []
+    for child in plan.get("Plans", []):
+        names.extend(plan_relations(child))
+    return names
+
+
+def check_partitions():
+    from phonepe_views import VIEWS, view_query
+
+    conn = get_connection(LIVE_SCHEMA)
+    failures = []
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT MAX(Years) FROM data_catalog")
+            year = cursor.fetchone()[0]
+            queries = [(d, f"SELECT * FROM {d} WHERE Years = {year} AND Quarter = 1", {}) for d in DATASETS]
+            queries += [(v, *view_query(v, year, 1)) for v in VIEWS if VIEWS[v].get("periods")]
+            for name, sql, params in queries:
+                # Compiled queries bind :name parameters (SQLAlchemy style), psycopg2 wants %(name)s
+                sql = re.sub(r"(?<!:):(\w+)", r"%(\1)s", sql)
+                cursor.execute("EXPLAIN (FORMAT JSON) " + sql.strip().rstrip(";"), params)
+                touched = sorted({r for r in plan_relations(cursor.fetchone()[0][0]["Plan"]) if r.startswith(tuple(DATASETS))})
+                ok = bool(touched) and all(r.endswith(f"_{year}") for r in touched)
+                print(f"{'ok  ' if ok else 'FAIL'} {name:<24} {', '.join(touched)}")
+                if not ok:
+                    failures.append(name)
+    finally:
+        conn.close()
+    return failures
+
+
+# ---------------- Pipeline ----------------
+
+def run_pipeline(datasets=None, workers=4, fresh=False):
+    datasets = list(datasets or DATASETS)
+    ckpt = Checkpoint(run={"datasets": sorted(datasets), "source": ARCHIVE_PATH or DATA_ROOT})
+    if fresh:
+        ckpt.reset()
+    print(f"Run {ckpt.manifest['run_id']}")
+
+    if not ckpt.done("_global", "prepare"):
+        ckpt.mark("_global", "prepare", prepare_staging(datasets, ckpt))
+
+    failed = {}
+    if workers == 1:
+        # In this thread, one after another (what profiling needs)
+        for dataset in datasets:
+            try:
+                run_dataset(dataset, ckpt)
+            except Exception as error:
+                failed[dataset] = error
+    else:
+        # Datasets do not depend on each other, so they run concurrently
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {d: pool.submit(run_dataset, d, ckpt) for d in datasets}
+        for dataset, future in futures.items():
+            if future.exception() is not None:
+                failed[dataset] = future.exception()
+    if failed:
+        for dataset, error in failed.items():
+            print(f"[{dataset}] failed: {error}")
+        raise RuntimeError(f"{len(failed)} dataset(s) failed, re-run to resume: {', '.join(failed)}")
+
+    for stage, func in GLOBAL_STAGES:
+        if ckpt.done("_global", stage):
+            continue
+        start = time.perf_counter()
+        with profiler.stage("_global", stage):
+            info = func(datasets, ckpt)
+        info["seconds"] = round(time.perf_counter() - start, 3)
+        ckpt.mark("_global", stage, info)
+        record_stage("_global", stage, info)
+        print(f"[global] {stage} done {info}")
+
+    ckpt.finish()
+    return ckpt.manifest
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="PhonePe Pulse ETL pipeline")
+    parser.add_argument("--datasets", nargs="*", choices=list(DATASETS), help="only run these datasets")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--fresh", action="store_true", help="ignore checkpoints and start over")
+    parser.add_argument("--metrics-file", default="etl_metrics.prom", help="Prometheus text dump written at the end")
+    parser.add_argument("--metrics-port", type=int, help="also serve live metrics on this port during the run")
+    parser.add_argument("--check-partitions", action="store_true",
+                        help="EXPLAIN period-filtered queries and check they only read the selected year's partition")
+    parser.add_argument("--profile", action="store_true",
+                        help="record wall/CPU time and peak memory per stage and the slowest files (runs datasets serially)")
+    parser.add_argument("--profile-top", type=int, default=20, help="how many of the slowest files to list")
+    parser.add_argument("--profile-out", help="write the profile report, a cProfile dump and collapsed stacks here")
+    args = parser.parse_args()
+    if args.check_partitions:
+        raise SystemExit(1 if check_partitions() else 0)
+    if args.metrics_port:
+        start_http_server(args.metrics_port)
+    if args.profile or args.profile_out:
+        profiler.enable(flamegraph=bool(args.profile_out))
+        args.workers = 1
+    try:
+        run_pipeline(args.datasets, args.workers, args.fresh)
+    finally:
+        registry.dump(args.metrics_file)
+        if profiler.enabled:
+            profiler.stop()
+            print(profiler.report(args.profile_top))
+            if args.profile_out:
+                profiler.write(args.profile_out, args.profile_top)
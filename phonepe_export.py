@@ -0,0 +1,246 @@
+#lib
+import os
+import csv
+import time
+import uuid
+import argparse
+import tracemalloc
+
+from phonepe_db import engine
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+PARQUET_AVAILABLE = pq is not None
+
+
+# ---------------- Streaming export ----------------
+# Rows come from a named (server-side) psycopg2 cursor in fixed-size chunks and
+# go straight into the CSV / Parquet writer, so memory use depends on the chunk
+# size and not on how many rows the query returns.
+
+CHUNK_ROWS = 20000
+
+EXPORT_DIR = os.environ.get("PULSE_EXPORT_DIR", "exports")
+
+
+def bind_params(sql, params):
+    # phonepe_db queries use :name placeholders, psycopg2 wants %(name)s
+    for name in sorted(params or {}, key=len, reverse=True):
+        sql = sql.replace(f":{name}", f"%({name})s")
+    return sql
+
+
+def stream_rows(sql, params=None, chunk_rows=CHUNK_ROWS, conn=None, describe=False):
+    # Yields the column names first (the full cursor.description with
+    # describe=True), then lists of at most chunk_rows rows.
+    # conn: a pooled connection the caller checked out (and will return); by
+    # default one is checked out for the duration of the stream.
+    own = conn is None
+    if own:
+        conn = engine.raw_connection()
+    try:
+        cursor = conn.cursor(name=f"export_{uuid.uuid4().hex}")
+        cursor.itersize = chunk_rows
+        cursor.execute(bind_params(sql.strip().rstrip(";"), params), params or None)
+        first = cursor.fetchmany(chunk_rows)
+        yield list(cursor.description) if describe else [c[0] for c in cursor.description]
+        while first:
+            yield first
+            first = cursor.fetchmany(chunk_rows)
+        cursor.close()
+    finally:
+        if own:
+            conn.rollback()
+            conn.close()
+
+
+def export_csv(sql, path, params=None, chunk_rows=CHUNK_ROWS):
+    rows = 0
+    chunks = stream_rows(sql, params, chunk_rows)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(next(chunks))
+        for chunk in chunks:
+            writer.writerows(chunk)
+            rows += len(chunk)
+    return rows
+
+
+# Postgres type OID -> Arrow type. The Parquet schema is fixed from the cursor
+# description before the first row: inferring it from the first chunk breaks
+# on later chunks (larger SUM() decimals, columns that start out NULL).
+PG_ARROW_TYPES = {
+    16: "bool_", 20: "int64", 21: "int16", 23: "int32", 700: "float32", 701: "float64",
+    25: "string", 1043: "string", 1042: "string", 19: "string",
+    1082: "date32", 1114: "timestamp", 1184: "timestamp",
+}
+NUMERIC_OID = 1700
+
+
+def arrow_field(column):
+    if column.type_code == NUMERIC_OID:
+        if column.precision and column.scale is not None and column.precision <= 38:
+            return pa.field(column.name, pa.decimal128(column.precision, column.scale)), None
+        # Unconstrained numeric, e.g. SUM(bigint): precision and scale vary row by row
+        return pa.field(column.name, pa.float64()), float
+    name = PG_ARROW_TYPES.get(column.type_code)
+    if name is None:
+        return pa.field(column.name, pa.string()), str
+    if name == "timestamp":
+        return pa.field(column.name, pa.timestamp("us", tz="UTC" if column.type_code == 1184 else None)), None
+    return pa.field(column.name, getattr(pa, name)()), None
+
+
+def export_parquet(sql, path, params=None, chunk_rows=CHUNK_ROWS):
+    if pq is None:
+        raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow)")
+    rows = 0
+    chunks = stream_rows(sql, params, chunk_rows, describe=True)
+    fields = [arrow_field(c) for c in next(chunks)]
+    schema = pa.schema([f for f, _ in fields])
+    with pq.ParquetWriter(path, schema) as writer:
+        for chunk in chunks:
+            # One row group per chunk, always in the schema fixed above
+            arrays = []
+            for (field, convert), values in zip(fields, zip(*chunk)):
+                if convert is not None:
+                    values = [None if v is None else convert(v) for v in values]
+                arrays.append(pa.array(values, type=field.type))
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            rows += len(chunk)
+    return rows
+
+
+EXPORTERS = {"csv": export_csv, "parquet": export_parquet}
+
+
+def export_query(sql, name, fmt="csv", params=None):
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    path = os.path.join(EXPORT_DIR, f"{name}.{fmt}")
+    tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+    rows = EXPORTERS[fmt](sql, tmp, params)
+    os.replace(tmp, path)
+    return path, rows
+
+
+# ---------------- Benchmark ----------------
+# Compares the streaming path with pandas read_sql_query on a synthetic table
+# shaped like map_transaction.
+
+def create_synthetic_table(rows, table="bench_map_transaction"):
+    conn = engine.raw_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {table}")
+            cursor.execute(f"""CREATE TABLE {table} AS
+                               SELECT 'State ' || (i % 36)          AS States,
+                                      2018 + (i % 7)                AS Years,
+                                      1 + (i % 4)                   AS Quarter,
+                                      'District ' || (i % 800)      AS Districts,
+                                      (random() * 1e6)::bigint      AS Transaction_count,
+                                      (random() * 1e9)::bigint      AS Transaction_amount
+                               FROM generate_series(1, %s) AS i""", (rows,))
+        conn.commit()
+    finally:
+        conn.close()
+    return table
+
+
+def measure(func):
+    tracemalloc.start()
+    start = time.perf_counter()
+    rows = func()
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return rows, seconds, peak / 1e6
+
+
+def benchmark(sizes, fmt="csv"):
+    import pandas as pd
+
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    print(f"{'rows':>10} {'path':>10} {'seconds':>9} {'rows/s':>11} {'peak MB':>9}")
+    for size in sizes:
+        table = create_synthetic_table(size)
+        sql = f"SELECT * FROM {table}"
+        out = os.path.join(EXPORT_DIR, f"bench.{fmt}")
+
+        rows, seconds, peak = measure(lambda: EXPORTERS[fmt](sql, out))
+        print(f"{rows:>10} {'stream':>10} {seconds:>9.2f} {rows / seconds:>11.0f} {peak:>9.1f}")
+
+        def pandas_path():
+            df = pd.read_sql_query(sql, engine)
+            if fmt == "csv":
+                df.to_csv(out, index=False)
+            else:
+                df.to_parquet(out, index=False)
+            return len(df)
+
+        rows, seconds, peak = measure(pandas_path)
+        print(f"{rows:>10} {'pandas':>10} {seconds:>9.2f} {rows / seconds:>11.0f} {peak:>9.1f}")
+
+        conn = engine.raw_connection()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(f"DROP TABLE IF EXISTS {table}")
+            conn.commit()
+        finally:
+            conn.close()
+
+
+def fetch_benchmark(sizes):
+    # read_sql_query vs the compact chunked fetch (phonepe_db.read_compact) into a DataFrame
+    import pandas as pd
+    from phonepe_db import read_compact
+
+    print(f"{'rows':>10} {'path':>10} {'seconds':>9} {'peak MB':>9} {'frame MB':>9}")
+    for size in sizes:
+        table = create_synthetic_table(size)
+        sql = f"SELECT * FROM {table}"
+        paths = [("pandas", lambda: pd.read_sql_query(sql, engine)), ("compact", lambda: read_compact(sql))]
+        for name, read in paths:
+            result = {}
+
+            def run():
+                result["df"] = read()
+                return len(result["df"])
+
+            rows, seconds, peak = measure(run)
+            frame_mb = result.pop("df").memory_usage(deep=True).sum() / 1e6
+            print(f"{rows:>10} {name:>10} {seconds:>9.2f} {peak:>9.1f} {frame_mb:>9.1f}")
+
+        conn = engine.raw_connection()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(f"DROP TABLE IF EXISTS {table}")
+            conn.commit()
+        finally:
+            conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stream a query result to CSV or Parquet")
+    parser.add_argument("sql", nargs="?", help="query to export")
+    parser.add_argument("--name", default="export")
+    parser.add_argument("--format", choices=list(EXPORTERS), default="csv")
+    parser.add_argument("--benchmark", nargs="*", type=int, metavar="ROWS",
+                        help="benchmark against pandas on synthetic tables of these sizes")
+    parser.add_argument("--fetch-benchmark", nargs="*", type=int, metavar="ROWS",
+                        help="compare read_sql_query with the compact chunked fetch on synthetic tables of these sizes")
+    args = parser.parse_args()
+
+    if args.fetch_benchmark is not None:
+        fetch_benchmark(args.fetch_benchmark or [100000, 1000000, 5000000])
+    elif args.benchmark is not None:
+        benchmark(args.benchmark or [100000, 1000000, 5000000], args.format)
+    elif args.sql:
+        path, rows = export_query(args.sql, args.name, args.format)
+        print(f"Wrote {rows} rows to {path}")
+    else:
+        parser.error("give a query, --benchmark or --fetch-benchmark")
@@ -0,0 +1,159 @@
+#lib
+import numpy as np
+import pandas as pd
+
+
+# ---------------- Forecast model ----------------
+# Every (state, category) quarterly series gets the same log-linear trend +
+# quarter-of-year seasonal model:
+#
+#   log1p(y_t) = a + b*t + s2*[Q2] + s3*[Q3] + s4*[Q4] + e_t
+#
+# All series are fitted together: the series are stacked into one
+# (n_series x n_periods) matrix and the per-series normal equations are
+# solved as a single batched np.linalg.solve call. Missing quarters (a state
+# that starts reporting later, insurance starting in 2020) are handled with a
+# 0/1 weight mask instead of per-series Python loops.
+
+# Series with fewer observed quarters than this are not forecast
+MIN_POINTS = 6
+
+# ~95% prediction interval
+Z = 1.96
+
+# Tiny ridge so series with a missing quarter-of-year stay solvable
+RIDGE = 1e-6
+
+SOURCES = {
+    "aggregated_transaction": "Transaction_type",
+    "aggregated_insurance": "Insurance_type",
+}
+
+
+def period_index(years, quarter):
+    return np.asarray(years) * 4 + (np.asarray(quarter) - 1)
+
+
+def design_matrix(t, t0):
+    t = np.asarray(t)
+    q = t % 4
+    return np.column_stack([
+        np.ones(len(t)),
+        (t - t0) / 4.0,
+        (q == 1).astype(float),
+        (q == 2).astype(float),
+        (q == 3).astype(float),
+    ])
+
+
+def to_matrix(df, keys, value):
+    # Long frame -> (series x period) matrix with NaN for missing quarters
+    df = df.assign(t=period_index(df["years"], df["quarter"]))
+    wide = df.pivot_table(index=keys, columns="t", values=value, aggfunc="sum")
+    full = np.arange(wide.columns.min(), wide.columns.max() + 1)
+    wide = wide.reindex(columns=full)
+    return wide.index, full, wide.to_numpy(dtype=float)
+
+
+def fit_forecast(Y, t, horizon=1):
+    # Y: (n, T) with NaN for missing, t: (T,) period indexes
+    n, T = Y.shape
+    t0 = t[0]
+    X = design_matrix(t, t0)                               # (T, p)
+    p = X.shape[1]
+    W = np.isfinite(Y) & (Y >= 0)                          # (n, T)
+    L = np.where(W, np.log1p(np.where(W, Y, 0.0)), 0.0)    # (n, T)
+    w = W.astype(float)
+
+    XtWX = np.einsum("nt,ti,tj->nij", w, X, X) + RIDGE * np.eye(p)
+    XtWy = np.einsum("nt,ti,nt->ni", w, X, L)
+    beta = np.linalg.solve(XtWX, XtWy[..., None])[..., 0]  # (n, p)
+
+    resid = (L - beta @ X.T) * w
+    n_obs = w.sum(axis=1)
+    dof = np.maximum(n_obs - p, 1.0)
+    sigma = np.sqrt((resid ** 2).sum(axis=1) / dof)
+
+    t_future = np.arange(t[-1] + 1, t[-1] + 1 + horizon)
+    Xf = design_matrix(t_future, t0)                       # (h, p)
+    mean = beta @ Xf.T                                     # (n, h)
+    XtWX_inv = np.linalg.inv(XtWX)
+    leverage = np.einsum("hi,nij,hj->nh", Xf, XtWX_inv, Xf)
+    half = Z * sigma[:, None] * np.sqrt(1.0 + leverage)
+
+    valid = (n_obs >= MIN_POINTS)[:, None]
+    forecast = np.where(valid, np.expm1(mean), np.nan)
+    lower = np.where(valid, np.maximum(np.expm1(mean - half), 0.0), np.nan)
+    upper = np.where(valid, np.expm1(mean + half), np.nan)
+    return t_future, forecast, lower, upper
+
+
+def forecast_frame(df, category, horizon=1):
+    # df has lower-case columns: states, <category>, years, quarter, transaction_count, transaction_amount
+    frames = []
+    for metric in ("transaction_count", "transaction_amount"):
+        keys, t, Y = to_matrix(df, ["states", category], metric)
+        t_future, forecast, lower, upper = fit_forecast(Y, t, horizon)
+        for h, tf in enumerate(t_future):
+            frames.append(pd.DataFrame({
+                "states": keys.get_level_values(0),
+                "category": keys.get_level_values(1),
+                "years": int(tf // 4),
+                "quarter": int(tf % 4 + 1),
+                "metric": metric,
+                "last_actual": Y[:, -1],
+                "forecast": forecast[:, h],
+                "lower": lower[:, h],
+                "upper": upper[:, h],
+            }))
+    out = pd.concat(frames, ignore_index=True)
+    return out.dropna(subset=["forecast"])
+
+
+# ---------------- ETL post-stage ----------------
+
+def forecast_stage(datasets, ckpt, horizon=1):
+    from psycopg2.extras import execute_values
+    from phonepe_etl import get_connection
+
+    conn = get_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("""CREATE TABLE IF NOT EXISTS forecast_quarterly (
+                                  Dataset varchar(64),
+                                  States varchar(255),
+                                  Category varchar(255),
+                                  Years int,
+                                  Quarter int,
+                                  Metric varchar(32),
+                                  Last_actual float,
+                                  Forecast float,
+                                  Lower_bound float,
+                                  Upper_bound float)""")
+            rows = 0
+            for dataset, category in SOURCES.items():
+                if dataset not in datasets:
+                    continue
+                cursor.execute(f"""SELECT States, {category}, Years, Quarter,
+                                          SUM(Transaction_count), SUM(Transaction_amount)
+                                   FROM {dataset}
+                                   GROUP BY States, {category}, Years, Quarter""")
+                df = pd.DataFrame(cursor.fetchall(), columns=["states", category.lower(), "years", "quarter",
+                                                              "transaction_count", "transaction_amount"])
+                if df.empty:
+                    continue
+                out = forecast_frame(df, category.lower(), horizon)
+                cursor.execute("DELETE FROM forecast_quarterly WHERE Dataset = %s", (dataset,))
+                execute_values(cursor,
+                               """INSERT INTO forecast_quarterly (Dataset, States, Category, Years, Quarter, Metric,
+                                                                  Last_actual, Forecast, Lower_bound, Upper_bound)
+                                  VALUES %s""",
+                               [(dataset, r.states, r.category, r.years, r.quarter, r.metric,
+                                 float(r.last_actual) if np.isfinite(r.last_actual) else None,
+                                 float(r.forecast), float(r.lower), float(r.upper))
+                                for r in out.itertuples(index=False)])
+                rows += len(out)
+        conn.commit()
+    finally:
+        conn.close()
+    return {"rows": rows}
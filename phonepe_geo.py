@@ -0,0 +1,338 @@
+#lib
+import os
+import re
+import json
+import time
+import logging
+import argparse
+from functools import lru_cache
+
+import numpy as np
+
+from phonepe_metrics import registry
+
+
+# ---------------- District geometry ----------------
+# District boundaries for all of India are several MB of GeoJSON, far too much
+# to put into every choropleth the dashboard sends to the browser. They are
+# converted once into one small TopoJSON file per state:
+#
+#   geometry/<state key>.topo.json
+#
+# Coordinates are quantized to a 2^bits grid over the state's bounding box,
+# rings are simplified (Douglas-Peucker, in grid units) and stored as
+# delta-encoded arcs. Arcs are not shared between neighbouring districts; the
+# gain comes from quantization, simplification and slicing by state. The map
+# then only ever carries the selected state's districts.
+#
+# The files are built by the ETL (geometry stage) or `python phonepe_geo.py`,
+# never while serving a dashboard request.
+
+DISTRICT_GEOJSON = os.environ.get(
+    "PULSE_DISTRICT_GEOJSON",
+    "https://raw.githubusercontent.com/geohacker/india/master/district/india_district.geojson")
+# Feature properties holding the state and district name in that file
+STATE_PROPERTY = "NAME_1"
+DISTRICT_PROPERTY = "NAME_2"
+
+GEOMETRY_DIR = os.environ.get("PULSE_GEOMETRY_DIR", "geometry")
+
+QUANTIZE_BITS = 12
+SIMPLIFY_TOLERANCE = 1.5   # grid units
+DECIMALS = 4               # precision of the decoded GeoJSON (~10 m)
+
+geometry_seconds = registry.histogram("pulse_district_geometry_seconds", "Time to load one state's district geometry")
+
+log = logging.getLogger(__name__)
+
+# The boundary file predates 2014: Telangana's districts are still in Andhra
+# Pradesh, Ladakh's in Jammu & Kashmir, and Dadra and Nagar Haveli and Daman
+# and Diu are two territories. Pulse state key -> boundary state keys.
+STATE_ALIASES = {
+    "telangana": ["andhrapradesh"],
+    "ladakh": ["jammuandkashmir"],
+    "dadraandnagarhavelianddamananddiu": ["dadraandnagarhaveli", "damananddiu"],
+}
+
+# Renamed districts, Pulse key -> boundary key (both through geo_key). Districts
+# carved out after 2011 have no boundary at all; they are logged by match_districts.
+DISTRICT_ALIASES = {
+    "bengaluruurban": "bangaloreurban",
+    "bengalururural": "bangalorerural",
+    "belagavi": "belgaum",
+    "ballari": "bellary",
+    "kalaburagi": "gulbarga",
+    "vijayapura": "bijapur",
+    "shivamogga": "shimoga",
+    "tumakuru": "tumkur",
+    "mysuru": "mysore",
+    "chikkamagaluru": "chikmagalur",
+    "gurugram": "gurgaon",
+    "prayagraj": "allahabad",
+    "ayodhya": "faizabad",
+    "ysr": "cuddapah",
+    "ysrkadapa": "cuddapah",
+    "kadapa": "cuddapah",
+    "spsrnellore": "nellore",
+    "sripottisriramulunellore": "nellore",
+    "hooghly": "hugli",
+    "purbamedinipur": "eastmidnapore",
+    "paschimmedinipur": "westmidnapore",
+    "purbabardhaman": "barddhaman",
+    "paschimbardhaman": "barddhaman",
+    "kanchipuram": "kancheepuram",
+    "thoothukkudi": "thoothukudi",
+    "tiruvallur": "thiruvallur",
+    "lehladakh": "leh",
+    "nuh": "mewat",
+    "sasnagar": "sahibzadaajitsinghnagar",
+    "sriganganagar": "ganganagar",
+    "kheri": "lakhimpurkheri",
+}
+
+_unmatched_logged = set()
+
+
+def geo_key(name):
+    # Pulse, the GeoJSON and the Pulse "top" lists all spell names a little differently
+    name = str(name).lower().replace("&", "and")
+    name = re.sub(r"\bdistrict\b", "", name)
+    return re.sub(r"[^a-z0-9]", "", name)
+
+
+def district_key(name):
+    # Key of a Pulse district name in the boundary file
+    key = geo_key(name)
+    return DISTRICT_ALIASES.get(key, key)
+
+
+def load_source(source=DISTRICT_GEOJSON):
+    if re.match(r"https?://", source):
+        import requests
+
+        resp = requests.get(source)
+        resp.raise_for_status()
+        return resp.json()
+    with open(source, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+# ---------------- Conversion ----------------
+
+def simplify(points, tolerance):
+    # Douglas-Peucker on an (n, 2) array, keeping both ends
+    if len(points) < 3:
+        return points
+    keep = np.zeros(len(points), dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        a, b = points[first].astype(float), points[last].astype(float)
+        inner = points[first + 1:last].astype(float)
+        d = b - a
+        norm = np.hypot(*d)
+        if norm == 0:
+            dist = np.hypot(*(inner - a).T)
+        else:
+            dist = np.abs(d[0] * (inner[:, 1] - a[1]) - d[1] * (inner[:, 0] - a[0])) / norm
+        i = int(np.argmax(dist))
+        if dist[i] > tolerance:
+            keep[first + 1 + i] = True
+            stack.append((first, first + 1 + i))
+            stack.append((first + 1 + i, last))
+    return points[keep]
+
+
+def polygons(geometry):
+    if geometry["type"] == "Polygon":
+        return [geometry["coordinates"]]
+    if geometry["type"] == "MultiPolygon":
+        return geometry["coordinates"]
+    return []
+
+
+def to_topology(features, bits=QUANTIZE_BITS, tolerance=SIMPLIFY_TOLERANCE):
+    coords = np.concatenate([np.asarray(ring, dtype=float)[:, :2]
+                             for f in features for poly in polygons(f["geometry"]) for ring in poly])
+    x0, y0 = coords.min(axis=0)
+    x1, y1 = coords.max(axis=0)
+    n = (1 << bits) - 1
+    scale = ((x1 - x0) / n or 1.0, (y1 - y0) / n or 1.0)
+
+    arcs, geometries = [], []
+    for f in features:
+        shape = []
+        for poly in polygons(f["geometry"]):
+            rings = []
+            for ring in poly:
+                q = np.round((np.asarray(ring, dtype=float)[:, :2] - (x0, y0)) / scale).astype(np.int64)
+                q = q[np.r_[True, np.any(np.diff(q, axis=0) != 0, axis=1)]]
+                s = simplify(q, tolerance)
+                if len(s) < 4:
+                    s = q
+                if len(s) < 4:
+                    continue
+                rings.append([len(arcs)])
+                arcs.append(np.vstack([s[:1], np.diff(s, axis=0)]).tolist())
+            if rings:
+                shape.append(rings)
+        if shape:
+            geometries.append({"type": "MultiPolygon", "arcs": shape,
+                               "properties": {"district": f["properties"][DISTRICT_PROPERTY]}})
+    return {
+        "type": "Topology",
+        "transform": {"scale": list(scale), "translate": [float(x0), float(y0)]},
+        "objects": {"districts": {"type": "GeometryCollection", "geometries": geometries}},
+        "arcs": arcs,
+    }
+
+
+def to_geojson(topology, decimals=DECIMALS):
+    scale = np.array(topology["transform"]["scale"])
+    translate = np.array(topology["transform"]["translate"])
+    arcs = [np.round(np.cumsum(np.array(a), axis=0) * scale + translate, decimals).tolist()
+            for a in topology["arcs"]]
+    features = []
+    for g in topology["objects"]["districts"]["geometries"]:
+        name = g["properties"]["district"]
+        features.append({
+            "type": "Feature",
+            "id": geo_key(name),
+            "properties": {"district": name, "key": geo_key(name)},
+            "geometry": {"type": "MultiPolygon",
+                         "coordinates": [[arcs[ring[0]] for ring in poly] for poly in g["arcs"]]},
+        })
+    return {"type": "FeatureCollection", "features": features}
+
+
+def slice_by_state(source):
+    states = {}
+    for f in source["features"]:
+        if f.get("geometry") is None:
+            continue
+        states.setdefault(geo_key(f["properties"][STATE_PROPERTY]), []).append(f)
+    return states
+
+
+def build(source=None, bits=QUANTIZE_BITS, tolerance=SIMPLIFY_TOLERANCE):
+    source = source or load_source()
+    os.makedirs(GEOMETRY_DIR, exist_ok=True)
+    written = 0
+    for state, features in slice_by_state(source).items():
+        path = os.path.join(GEOMETRY_DIR, f"{state}.topo.json")
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(to_topology(features, bits, tolerance), f, separators=(",", ":"))
+        os.replace(path + ".tmp", path)
+        written += 1
+    return written
+
+
+# ---------------- Dashboard lookups ----------------
+
+@lru_cache(maxsize=64)
+def _state_geojson(key):
+    path = os.path.join(GEOMETRY_DIR, f"{key}.topo.json")
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return to_geojson(json.load(f))
+
+
+def district_geojson(state):
+    # GeoJSON of one state's districts, or None if there is no geometry for it
+    # (geometry/ not built yet, or a state the boundary file does not have)
+    with geometry_seconds.time():
+        key = geo_key(state)
+        parts = [_state_geojson(k) for k in STATE_ALIASES.get(key, [key])]
+        parts = [p for p in parts if p is not None]
+        if not parts:
+            if key not in _unmatched_logged:
+                _unmatched_logged.add(key)
+                log.warning("No district geometry for %s in %s/ (run python phonepe_geo.py)", state, GEOMETRY_DIR)
+            return None
+        if len(parts) == 1:
+            return parts[0]
+        return {"type": "FeatureCollection", "features": [f for p in parts for f in p["features"]]}
+
+
+def match_districts(state, districts, geojson):
+    # Boundary key of every Pulse district name; names without a boundary are
+    # logged once so they can be added to DISTRICT_ALIASES
+    keys = [district_key(d) for d in districts]
+    known = {f["properties"]["key"] for f in geojson["features"]}
+    for name, key in zip(districts, keys):
+        if key not in known and (state, name) not in _unmatched_logged:
+            _unmatched_logged.add((state, name))
+            log.warning("District %r of %s has no boundary (key %r)", name, state, key)
+    return keys
+
+
+# ---------------- ETL stage ----------------
+
+def geometry_stage(datasets, ckpt):
+    # Builds geometry/ once; a missing boundary file only costs the drill-down its maps
+    if os.path.isdir(GEOMETRY_DIR) and any(n.endswith(".topo.json") for n in os.listdir(GEOMETRY_DIR)):
+        return {"skipped": True}
+    try:
+        return {"states": build()}
+    except Exception as error:
+        print(f"[geometry] not built: {error}")
+        return {"error": str(error)}
+
+
+# ---------------- Benchmark ----------------
+# Payload the browser receives and time to build + serialize the figure, for
+# the full raw GeoJSON, the state's raw slice and the quantized slice.
+
+def benchmark(states, bits=QUANTIZE_BITS, tolerance=SIMPLIFY_TOLERANCE):
+    import plotly.express as px
+
+    source = load_source()
+    sliced = slice_by_state(source)
+
+    def render(geojson, keys):
+        start = time.perf_counter()
+        fig = px.choropleth(locations=keys, color=np.arange(len(keys)), geojson=geojson,
+                            featureidkey="properties.key")
+        fig.update_geos(fitbounds="locations", visible=False)
+        payload = len(fig.to_json())
+        return payload, time.perf_counter() - start
+
+    def keyed(features):
+        return {"type": "FeatureCollection",
+                "features": [dict(f, properties=dict(f["properties"], key=geo_key(f["properties"][DISTRICT_PROPERTY])))
+                             for f in features]}
+
+    print(f"{'state':>24} {'geometry':>12} {'stored KB':>10} {'figure KB':>10} {'render s':>9}")
+    for state in states:
+        features = sliced.get(geo_key(state))
+        if not features:
+            print(f"{state:>24} not in {DISTRICT_GEOJSON}")
+            continue
+        keys = [geo_key(f["properties"][DISTRICT_PROPERTY]) for f in features]
+        topology = to_topology(features, bits, tolerance)
+        variants = [
+            ("full raw", len(json.dumps(source)), keyed(source["features"])),
+            ("state raw", len(json.dumps(features)), keyed(features)),
+            ("state topo", len(json.dumps(topology, separators=(",", ":"))), to_geojson(topology)),
+        ]
+        for name, stored, geojson in variants:
+            payload, seconds = render(geojson, keys)
+            print(f"{state:>24} {name:>12} {stored / 1e3:>10.0f} {payload / 1e3:>10.0f} {seconds:>9.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build per-state quantized TopoJSON of India's districts")
+    parser.add_argument("--bits", type=int, default=QUANTIZE_BITS, help="quantization grid is 2^bits per axis")
+    parser.add_argument("--tolerance", type=float, default=SIMPLIFY_TOLERANCE, help="simplification tolerance in grid units")
+    parser.add_argument("--benchmark", nargs="*", metavar="STATE",
+                        help="compare payload size and render time for these states instead of building")
+    args = parser.parse_args()
+
+    if args.benchmark is not None:
+        benchmark(args.benchmark or ["Karnataka", "Uttar Pradesh", "Goa"], args.bits, args.tolerance)
+    else:
+        print(f"Wrote {build(bits=args.bits, tolerance=args.tolerance)} state files to {GEOMETRY_DIR}/")
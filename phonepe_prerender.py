@@ -0,0 +1,170 @@
+#lib
+import io
+import os
+import json
+import shutil
+import argparse
+from functools import lru_cache
+
+import pandas as pd
+import plotly.io as pio
+
+from phonepe_views import VIEWS, view_query, view_table, build_view, view_scenario
+from phonepe_views import grouping_views, grouping_query, split_grouping, view_sketch, sketch_frame
+
+
+# ---------------- Prerendered artifacts ----------------
+# After every ETL run each scenario view is rendered for every year/quarter it
+# can be asked for, and saved as
+#
+#   artifacts/v<data version>/<view id>/<year>_<quarter>.json   (or all.json)
+#
+# holding the result table and the Plotly figure JSON. artifacts/CURRENT names
+# the version the dashboard serves; it is only switched once a version is
+# complete. Choropleth figures are saved without the GeoJSON (the same ~MB for
+# every map) and get it re-attached when served. Artifacts are only served
+# while CURRENT matches the database's data version: if prerendering failed
+# after a publish, the dashboard queries the new data instead of showing the
+# previous version's numbers.
+
+ARTIFACT_DIR = os.environ.get("PULSE_ARTIFACT_DIR", "artifacts")
+
+# Older artifact versions kept next to the current one
+KEEP_VERSIONS = 2
+
+
+def artifact_name(year=None, quarter=None):
+    return "all.json" if year is None else f"{int(year)}_{int(quarter)}.json"
+
+
+def current_version():
+    try:
+        with open(os.path.join(ARTIFACT_DIR, "CURRENT"), "r") as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+@lru_cache(maxsize=1024)
+def _read(path):
+    # Raw JSON text only; figures are rebuilt from it on every use so callers can mutate them
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def load_artifact(view_id, year=None, quarter=None, geojson=None):
+    from phonepe_db import data_version
+
+    version = current_version()
+    live = data_version()
+    if version is None or live is None or version != f"v{live}":
+        return None
+    path = os.path.join(ARTIFACT_DIR, version, view_id, artifact_name(year, quarter))
+    if not os.path.exists(path):
+        return None
+    doc = json.loads(_read(path))
+    df = pd.read_json(io.StringIO(doc["table"]), orient="split", dtype=False)
+    fig = pio.from_json(doc["figure"]) if doc["figure"] else None
+    if fig is not None and VIEWS[view_id].get("map") and geojson is not None:
+        fig.update_traces(geojson=geojson, selector=dict(type="choropleth"))
+    return df, fig
+
+
+def save_artifact(directory, view_id, year, quarter, df, fig):
+    os.makedirs(os.path.join(directory, view_id), exist_ok=True)
+    figure = None
+    if fig is not None:
+        if VIEWS[view_id].get("map"):
+            fig.update_traces(geojson=None, selector=dict(type="choropleth"))
+        figure = fig.to_json()
+    doc = {"table": df.to_json(orient="split", index=False), "figure": figure}
+    with open(os.path.join(directory, view_id, artifact_name(year, quarter)), "w", encoding="utf-8") as f:
+        json.dump(doc, f)
+
+
+# ---------------- Prerender ----------------
+
+def view_periods(conn, table):
+    # Periods come from the data catalog, falling back to the table itself
+    try:
+        periods = pd.read_sql_query(f"SELECT years, quarter FROM data_catalog WHERE table_name = '{table}'", conn)
+    except Exception:
+        periods = pd.DataFrame()
+    if periods.empty:
+        periods = pd.read_sql_query(f"SELECT DISTINCT years, quarter FROM {table}", conn)
+    return sorted((int(y), int(q)) for y, q in periods.itertuples(index=False, name=None))
+
+
+def prerender(version, geojson):
+    from sqlalchemy import text
+    from phonepe_db import engine
+
+    def read(sql, params=None):
+        # Own connection, so a missing pincode_sketch table cannot abort conn's transaction
+        return pd.read_sql_query(text(sql), engine, params=params)
+
+    directory = os.path.join(ARTIFACT_DIR, f"v{version}")
+    tmp = directory + ".tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    count = 0
+    combined = {}
+    with engine.connect() as conn:
+        for view_id, view in VIEWS.items():
+            periods = view_periods(conn, view_table(view_id)) if view.get("periods") else [(None, None)]
+            for year, quarter in periods:
+                if view_id in grouping_views(view_scenario(view_id)):
+                    scenario = view_scenario(view_id)
+                    if scenario not in combined:
+                        combined[scenario] = read(*grouping_query(scenario))
+                    df = split_grouping(view_id, combined[scenario])
+                elif view_sketch(view_id, year, quarter):
+                    try:
+                        df = sketch_frame(view_id, read, year, quarter)
+                    except Exception:
+                        df = read(*view_query(view_id, year, quarter))
+                else:
+                    df = read(*view_query(view_id, year, quarter))
+                df, fig = build_view(view_id, df, year, quarter, geojson=geojson if view.get("map") else None)
+                save_artifact(tmp, view_id, year, quarter, df, fig)
+                count += 1
+    shutil.rmtree(directory, ignore_errors=True)
+    os.replace(tmp, directory)
+
+    # Switch the dashboard over, then drop old versions
+    pointer = os.path.join(ARTIFACT_DIR, "CURRENT")
+    with open(pointer + ".tmp", "w") as f:
+        f.write(f"v{version}")
+    os.replace(pointer + ".tmp", pointer)
+    versions = sorted((d for d in os.listdir(ARTIFACT_DIR) if d.startswith("v") and d[1:].isdigit()),
+                      key=lambda d: int(d[1:]))
+    for old in versions[:-(KEEP_VERSIONS + 1)]:
+        shutil.rmtree(os.path.join(ARTIFACT_DIR, old), ignore_errors=True)
+    return count
+
+
+def fetch_geojson():
+    import requests
+    from phonepe_views import INDIA_GEOJSON_URL
+
+    resp = requests.get(INDIA_GEOJSON_URL)
+    resp.raise_for_status()
+    return resp.json()
+
+
+def prerender_stage(datasets, ckpt):
+    # ETL post-stage, runs after publish so artifacts are named after the new data version
+    version = ckpt.manifest["stages"]["_global"]["publish"]["version"]
+    count = prerender(version, fetch_geojson())
+    return {"version": version, "artifacts": count}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prerender every dashboard view for the latest data version")
+    parser.add_argument("--version", type=int, help="data version to label the artifacts with (default: latest)")
+    args = parser.parse_args()
+
+    version = args.version
+    if version is None:
+        from phonepe_db import engine
+        version = int(pd.read_sql_query("SELECT MAX(version) AS v FROM data_version", engine)["v"].iloc[0])
+    print(f"Wrote {prerender(version, fetch_geojson())} artifacts for v{version}")
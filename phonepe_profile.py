@@ -0,0 +1,170 @@
+#lib
+import os
+import sys
+import json
+import time
+import cProfile
+import threading
+import tracemalloc
+from collections import Counter, defaultdict
+
+
+# ---------------- ETL profiling ----------------
+# Off unless the ETL runs with --profile. Then it records, per dataset and
+# stage, wall time, CPU time and peak traced memory; inside the stages the
+# time spent on file reads, JSON decoding, the parsers, DataFrame building,
+# state-name cleanup and the inserts; and the time of every single file.
+# With --profile-out it also writes a cProfile dump and a collapsed-stack
+# file (one "frame;frame;frame count" line per stack, the input format of
+# flamegraph.pl / speedscope) for CI artifacts.
+#
+# Datasets run one after another in the main thread while profiling, so
+# memory peaks and profiles are attributed to a single stage.
+
+SAMPLE_INTERVAL = 0.005
+
+
+class _Section:
+    __slots__ = ("profiler", "key", "start")
+
+    def __init__(self, profiler, key):
+        self.profiler = profiler
+        self.key = key
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        seconds = time.perf_counter() - self.start
+        with self.profiler.lock:
+            self.profiler.sections[self.key] += seconds
+
+
+class _Stage:
+    def __init__(self, profiler, dataset, stage):
+        self.profiler = profiler
+        self.dataset = dataset
+        self.stage = stage
+
+    def __enter__(self):
+        tracemalloc.reset_peak()
+        self.wall = time.perf_counter()
+        self.cpu = time.thread_time()
+
+    def __exit__(self, *exc):
+        wall = time.perf_counter() - self.wall
+        cpu = time.thread_time() - self.cpu
+        _, peak = tracemalloc.get_traced_memory()
+        self.profiler.stages.append({"dataset": self.dataset, "stage": self.stage, "wall": round(wall, 4),
+                                     "cpu": round(cpu, 4), "peak_mb": round(peak / 1e6, 2)})
+
+
+class _Null:
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc):
+        pass
+
+
+_NULL = _Null()
+
+
+class Profiler:
+    def __init__(self):
+        self.enabled = False
+        self.lock = threading.Lock()
+        self.stages = []
+        self.sections = defaultdict(float)
+        self.files = []
+        self.cprofile = None
+        self.sampler = None
+
+    def enable(self, flamegraph=False):
+        self.enabled = True
+        tracemalloc.start()
+        if flamegraph:
+            self.cprofile = cProfile.Profile()
+            self.sampler = StackSampler(threading.get_ident())
+            self.sampler.start()
+            self.cprofile.enable()
+
+    def stop(self):
+        if self.cprofile is not None:
+            self.cprofile.disable()
+            self.sampler.stop()
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    # Both are called on the ingestion hot path; disabled they cost one attribute check
+    def stage(self, dataset, stage):
+        return _Stage(self, dataset, stage) if self.enabled else _NULL
+
+    def section(self, dataset, name):
+        return _Section(self, (dataset, name)) if self.enabled else _NULL
+
+    def file(self, dataset, name, seconds):
+        if self.enabled:
+            self.files.append((seconds, dataset, name))
+
+    def report(self, top=20):
+        lines = [f"{'dataset':<24} {'stage':<14} {'wall s':>9} {'cpu s':>9} {'peak MB':>9}"]
+        for s in self.stages:
+            lines.append(f"{s['dataset']:<24} {s['stage']:<14} {s['wall']:>9.3f} {s['cpu']:>9.3f} {s['peak_mb']:>9.1f}")
+        lines += ["", f"{'dataset':<24} {'section':<14} {'wall s':>9}"]
+        for (dataset, name), seconds in sorted(self.sections.items()):
+            lines.append(f"{dataset:<24} {name:<14} {seconds:>9.3f}")
+        lines += ["", f"Slowest {top} files"]
+        for seconds, dataset, name in sorted(self.files, reverse=True)[:top]:
+            lines.append(f"{seconds * 1000:>9.2f} ms  {dataset:<24} {name}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, out_dir, top=20):
+        os.makedirs(out_dir, exist_ok=True)
+        with open(os.path.join(out_dir, "etl_profile.txt"), "w") as f:
+            f.write(self.report(top))
+        with open(os.path.join(out_dir, "etl_profile.json"), "w") as f:
+            json.dump({
+                "stages": self.stages,
+                "sections": [{"dataset": d, "section": n, "wall": round(s, 4)} for (d, n), s in sorted(self.sections.items())],
+                "slowest_files": [{"dataset": d, "file": n, "seconds": round(s, 5)}
+                                  for s, d, n in sorted(self.files, reverse=True)[:top]],
+            }, f, indent=2)
+        if self.cprofile is not None:
+            self.cprofile.dump_stats(os.path.join(out_dir, "etl.pstats"))
+            with open(os.path.join(out_dir, "etl.collapsed"), "w") as f:
+                for stack, count in sorted(self.sampler.counts.items()):
+                    f.write(f"{stack} {count}\n")
+
+
+class StackSampler:
+    # Samples the stack of one thread every SAMPLE_INTERVAL seconds
+    def __init__(self, thread_id, interval=SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.counts = Counter()
+        self.running = threading.Event()
+        self.thread = threading.Thread(target=self.run, name="etl-sampler", daemon=True)
+
+    def start(self):
+        self.running.set()
+        self.thread.start()
+
+    def stop(self):
+        self.running.clear()
+        self.thread.join()
+
+    def run(self):
+        while self.running.is_set():
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.counts[";".join(reversed(stack))] += 1
+            time.sleep(self.interval)
+
+
+profiler = Profiler()
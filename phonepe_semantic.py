@@ -0,0 +1,245 @@
+#lib
+from phonepe_sketch import SKETCH_K
+
+
+# ---------------- Semantic layer ----------------
+# Metrics and dimensions are declared once per model, together with every
+# table that can answer them. A request (metrics, dimensions, filters, top-N)
+# is compiled into SQL against the smallest source that can answer it, so the
+# dashboard asks for "transaction_amount by states" instead of writing SQL.
+#
+# A source lists the dimensions it carries and optionally:
+#   metrics    its own metric expressions (defaults to the model's)
+#   where      a filter that is always applied (rollup rows inside a table)
+#   requires   dimensions a request must group by to use it; top-K tables only
+#              hold the top 10 pincodes per state and quarter, so they can
+#              answer pincode questions but never state totals
+#
+#   sketch     the metric its pincode sketches rank by and the one they carry
+#              (phonepe_sketch.py), see sketch_source()
+#
+# Sources are listed smallest first. When the data catalog knows the row
+# count of every eligible source the smallest one wins, otherwise the first.
+# Equal requests compile to identical SQL, so they share one result-cache
+# entry wherever in the dashboard they are made.
+
+PERIOD = ["states", "years", "quarter"]
+
+MODELS = {
+    "transactions": {
+        "metrics": {
+            "transaction_count": "SUM(transaction_count)",
+            "transaction_amount": "SUM(transaction_amount)",
+        },
+        "sources": [
+            {"table": "aggregated_transaction", "dimensions": PERIOD + ["transaction_type"]},
+            {"table": "map_transaction", "dimensions": PERIOD + ["districts"]},
+            {"table": "top_transaction", "dimensions": PERIOD + ["pincodes"], "requires": ["pincodes"],
+             "sketch": {"rank": "transaction_amount", "carry": "transaction_count"}},
+        ],
+    },
+    "insurance": {
+        "metrics": {
+            "transaction_count": "SUM(transaction_count)",
+            "transaction_amount": "SUM(transaction_amount)",
+        },
+        "sources": [
+            {"table": "aggregated_insurance", "dimensions": PERIOD + ["insurance_type"]},
+            {"table": "map_insurance", "dimensions": PERIOD + ["districts"],
+             "metrics": {
+                 "transaction_count": "SUM(transaction_count)",
+                 "transaction_amount": "SUM(transaction_amount)",
+                 "districts_covered": "COUNT(DISTINCT districts)",
+             }},
+            {"table": "top_insurance", "dimensions": PERIOD + ["pincodes"], "requires": ["pincodes"],
+             "sketch": {"rank": "transaction_amount", "carry": "transaction_count"}},
+        ],
+    },
+    "users": {
+        "metrics": {
+            "registered_users": "SUM(registered_user)",
+            "app_opens": "SUM(app_opens)",
+        },
+        "sources": [
+            {"table": "map_user", "dimensions": PERIOD + ["districts"]},
+            # Top user files do not publish app opens
+            {"table": "top_user", "dimensions": PERIOD + ["pincodes"], "requires": ["pincodes"],
+             "metrics": {"registered_users": "SUM(registered_user)"},
+             "sketch": {"rank": "registered_users", "carry": None}},
+        ],
+    },
+    "devices": {
+        "metrics": {
+            "device_users": "SUM(transaction_count)",
+        },
+        "sources": [
+            # National rows of the brand pivot (built by the ETL), 1/37th of the table
+            {"table": "brand_pivot", "dimensions": ["years", "quarter", "brands"], "where": "states = 'India'",
+             "metrics": {"device_users": "SUM(users)"}},
+            # One row per state, period and brand: share and rank metrics are per brand,
+            # churn is per state and period (brands that left count as 1 - SUM(prev_share))
+            {"table": "brand_pivot", "dimensions": PERIOD + ["brands"],
+             "metrics": {
+                 "device_users": "SUM(users)",
+                 "share_pct": "SUM(share) * 100",
+                 "brand_rank": "MIN(brand_rank)",
+                 "prev_rank": "MIN(prev_rank)",
+                 "rank_change": "MIN(prev_rank) - MIN(brand_rank)",
+                 "share_change_pct": "(SUM(share) - SUM(prev_share)) * 100",
+                 "churn_pct": "(SUM(ABS(share - prev_share)) + GREATEST(1 - SUM(prev_share), 0)) / 2 * 100",
+             }},
+            {"table": "aggregated_user", "dimensions": PERIOD + ["brands"]},
+        ],
+    },
+}
+
+
+def source_rows(catalog, table, filters):
+    if catalog is None:
+        return None
+    rows = catalog[catalog["table_name"] == table]
+    if rows.empty:
+        return None
+    for column in ("years", "quarter"):
+        if filters.get(column) is not None:
+            rows = rows[rows[column] == int(filters[column])]
+    return int(rows["row_count"].sum())
+
+
+def plan(model, metrics, dimensions=(), filters=None, catalog=None):
+    # The source the request compiles against
+    filters = {k: v for k, v in (filters or {}).items() if v is not None}
+    needed = set(dimensions) | set(filters)
+    spec = MODELS[model]
+    eligible = []
+    for source in spec["sources"]:
+        available = source.get("metrics", spec["metrics"])
+        if not needed <= set(source["dimensions"]):
+            continue
+        if not set(metrics) <= set(available):
+            continue
+        if not set(source.get("requires", [])) <= set(dimensions):
+            continue
+        eligible.append(source)
+    if not eligible:
+        raise ValueError(f"No {model} source has {sorted(metrics)} by {sorted(needed)}")
+    rows = [source_rows(catalog, s["table"], filters) for s in eligible]
+    if None in rows:
+        return eligible[0]
+    return eligible[rows.index(min(rows))]
+
+
+def order_terms(metrics, dimensions, top_n=None, order_by=None):
+    # [(output column, descending)]
+    if order_by is None:
+        order_by = [f"-{next(iter(metrics))}"] if top_n else list(dimensions)
+    return [(c[1:], True) if c.startswith("-") else (c, False) for c in order_by]
+
+
+def compile_query(model, metrics, dimensions=(), filters=None, top_n=None, order_by=None, catalog=None):
+    # metrics: list of metric names, or {output column: metric name}
+    # filters: {dimension: value}, None values are ignored
+    # order_by: output columns, "-name" for descending; defaults to the first
+    #           metric descending for top-N requests and the dimensions otherwise
+    # Returns (sql, params) for phonepe_db.run_query
+    if not isinstance(metrics, dict):
+        metrics = {m: m for m in metrics}
+    dimensions = list(dimensions)
+    filters = {k: v for k, v in (filters or {}).items() if v is not None}
+    source = plan(model, list(metrics.values()), dimensions, filters, catalog)
+    expressions = source.get("metrics", MODELS[model]["metrics"])
+
+    select = dimensions + [f"{expressions[m]} AS {alias}" for alias, m in metrics.items()]
+    where = [source["where"]] if source.get("where") else []
+    params = {}
+    for column, value in filters.items():
+        where.append(f"{column} = :{column}")
+        params[column] = int(value) if column in ("years", "quarter") else value
+    order = [f"{column} DESC" if descending else column
+             for column, descending in order_terms(metrics, dimensions, top_n, order_by)]
+
+    columns = ",\n        ".join(select)
+    sql = f"""
+    SELECT
+        {columns}
+    FROM {source['table']}"""
+    if where:
+        sql += f"\n    WHERE {' AND '.join(where)}"
+    if dimensions:
+        sql += f"\n    GROUP BY {', '.join(dimensions)}"
+    if order:
+        sql += f"\n    ORDER BY {', '.join(order)}"
+    if top_n:
+        sql += f"\n    LIMIT {int(top_n)}"
+    return sql + "\n    ", params
+
+
+# ---------------- Precomputed answers ----------------
+# Two answers the ETL and the result cache already hold can stand in for a
+# compiled query:
+#
+#   grouping sets  several unfiltered requests of a model that share a source
+#                  are computed by one GROUPING SETS scan; the combined result
+#                  is cached once and split per request (grouping_rows)
+#   sketches       top-N pincode requests ranked by a top-K source's sketch
+#                  metric are answered by merging the Space-Saving sketches of
+#                  the selected states and periods, with an error bound
+
+def grouping_keys(requests):
+    # Every dimension of the requests, in order of first use
+    keys = []
+    for _, dimensions in requests:
+        keys += [d for d in dimensions if d not in keys]
+    return keys
+
+
+def grouping_id(keys, dimensions):
+    # GROUPING(a, b, ...) sets a bit for every argument that is NOT grouped, first argument highest
+    return sum(1 << (len(keys) - 1 - i) for i, key in enumerate(keys) if key not in dimensions)
+
+
+def compile_grouping_sets(model, requests):
+    # requests: [(metrics, dimensions)] without filters or top-N, answered by one source.
+    # The result has every key, grouping_id and one column per metric name.
+    requests = [(metrics if isinstance(metrics, dict) else {m: m for m in metrics}, list(dimensions))
+                for metrics, dimensions in requests]
+    sources = [plan(model, list(metrics.values()), dimensions) for metrics, dimensions in requests]
+    if any(source is not sources[0] for source in sources):
+        raise ValueError(f"{model} requests do not share one source")
+    source = sources[0]
+    expressions = source.get("metrics", MODELS[model]["metrics"])
+    keys = grouping_keys(requests)
+    names = []
+    for metrics, _ in requests:
+        names += [m for m in metrics.values() if m not in names]
+    columns = ",\n        ".join(keys + [f"GROUPING({', '.join(keys)}) AS grouping_id"]
+                                  + [f"{expressions[m]} AS {m}" for m in names])
+    sets = ", ".join("(" + ", ".join(dimensions) + ")" for _, dimensions in requests)
+    sql = f"""
+    SELECT
+        {columns}
+    FROM {source['table']}"""
+    if source.get("where"):
+        sql += f"\n    WHERE {source['where']}"
+    sql += f"\n    GROUP BY GROUPING SETS ({sets})"
+    return sql + "\n    ", {}
+
+
+def sketch_source(model, metrics, dimensions=(), filters=None, top_n=None, order_by=None):
+    # The source whose pincode sketches answer the request, or None
+    if not isinstance(metrics, dict):
+        metrics = {m: m for m in metrics}
+    filters = {k: v for k, v in (filters or {}).items() if v is not None}
+    if list(dimensions) != ["pincodes"] or not top_n or top_n > SKETCH_K or not set(filters) <= set(PERIOD):
+        return None
+    try:
+        source = plan(model, list(metrics.values()), dimensions, filters)
+    except ValueError:
+        return None
+    sketch = source.get("sketch")
+    if sketch is None or not set(metrics.values()) <= {sketch["rank"], sketch["carry"]}:
+        return None
+    column, descending = order_terms(metrics, dimensions, top_n, order_by)[0]
+    if not descending or metrics.get(column) != sketch["rank"]:
+        return None
+    return source
@@ -0,0 +1,183 @@
+#lib
+import json
+import argparse
+
+
+# ---------------- Heavy-hitter sketches ----------------
+# Space-Saving summaries of the top_* tables, one per (table, state, year,
+# quarter), built by the ETL into pincode_sketch. Top pincodes for any set of
+# states and periods come from merging those small sketches instead of a
+# GROUP BY pincodes over the whole table.
+#
+# Every counter holds [count, error, aux]: count never underestimates an
+# item's total, count - error never overestimates it. aux sums a second
+# measure (transaction count) for display only. Merging follows Agarwal et al.,
+# "Mergeable Summaries": an item missing from a full sketch may have had up
+# to that sketch's smallest count there, so it is charged that much as error.
+
+SKETCH_K = 64
+
+# table -> (ranked measure, secondary measure or None)
+SKETCH_TABLES = {
+    "top_transaction": ("transaction_amount", "transaction_count"),
+    "top_insurance": ("transaction_amount", "transaction_count"),
+    "top_user": ("registered_user", None),
+}
+
+
+class SpaceSaving:
+    def __init__(self, k=SKETCH_K, counters=None):
+        self.k = k
+        self.counters = counters or {}
+
+    def update(self, item, weight, aux=0):
+        if item in self.counters:
+            c = self.counters[item]
+            c[0] += weight
+            c[2] += aux
+        elif len(self.counters) < self.k:
+            self.counters[item] = [weight, 0, aux]
+        else:
+            # Replace the smallest counter; the newcomer inherits its count as error
+            victim = min(self.counters, key=lambda i: self.counters[i][0])
+            floor = self.counters.pop(victim)[0]
+            self.counters[item] = [floor + weight, floor, aux]
+
+    def floor(self):
+        # Largest count an item absent from this sketch can have had
+        return min(c[0] for c in self.counters.values()) if len(self.counters) >= self.k else 0
+
+    def merge(self, other):
+        mine, theirs = self.floor(), other.floor()
+        merged = {}
+        for item in set(self.counters) | set(other.counters):
+            a = self.counters.get(item, [mine, mine, 0])
+            b = other.counters.get(item, [theirs, theirs, 0])
+            merged[item] = [a[0] + b[0], a[1] + b[1], a[2] + b[2]]
+        keep = sorted(merged, key=lambda i: merged[i][0], reverse=True)[:self.k]
+        return SpaceSaving(self.k, {i: merged[i] for i in keep})
+
+    def top(self, n=10):
+        # [(item, count, error, aux)] by count, largest first
+        ranked = sorted(self.counters.items(), key=lambda kv: kv[1][0], reverse=True)[:n]
+        return [(item, c[0], c[1], c[2]) for item, c in ranked]
+
+    def to_json(self):
+        return json.dumps({"k": self.k, "counters": [[i] + c for i, c in self.counters.items()]})
+
+    @classmethod
+    def from_json(cls, text):
+        doc = json.loads(text)
+        return cls(doc["k"], {row[0]: row[1:] for row in doc["counters"]})
+
+
+def merge_all(sketches, k=SKETCH_K):
+    merged = SpaceSaving(k)
+    for sketch in sketches:
+        merged = merged.merge(sketch)
+    return merged
+
+
+# ---------------- ETL stage ----------------
+
+def sketch_stage(datasets, ckpt):
+    from psycopg2.extras import execute_values
+    from phonepe_etl import get_connection
+
+    tables = [t for t in SKETCH_TABLES if t in datasets]
+    if not tables:
+        return {"skipped": True}
+    conn = get_connection()
+    count = 0
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("""CREATE TABLE IF NOT EXISTS pincode_sketch (
+                                  Table_name varchar(64),
+                                  States varchar(255),
+                                  Years int,
+                                  Quarter int,
+                                  Sketch text)""")
+            for table in tables:
+                measure, aux = SKETCH_TABLES[table]
+                cursor.execute("DELETE FROM pincode_sketch WHERE Table_name = %s", (table,))
+                cursor.execute(f"""SELECT States, Years, Quarter, Pincodes, SUM({measure}), {f'SUM({aux})' if aux else '0'}
+                                   FROM {table}
+                                   WHERE Pincodes IS NOT NULL
+                                   GROUP BY States, Years, Quarter, Pincodes""")
+                sketches = {}
+                for state, year, quarter, pincode, value, extra in cursor.fetchall():
+                    sketch = sketches.setdefault((state, year, quarter), SpaceSaving())
+                    sketch.update(int(pincode), int(value or 0), int(extra or 0))
+                execute_values(cursor,
+                               "INSERT INTO pincode_sketch (Table_name, States, Years, Quarter, Sketch) VALUES %s",
+                               [(table, s, y, q, sk.to_json()) for (s, y, q), sk in sketches.items()])
+                count += len(sketches)
+            cursor.execute("CREATE INDEX IF NOT EXISTS pincode_sketch_idx ON pincode_sketch (Table_name, Years, Quarter)")
+        conn.commit()
+    finally:
+        conn.close()
+    return {"sketches": count}
+
+
+# ---------------- Lookups ----------------
+
+def top_pincodes(run_query, table, n=10, states=None, years=None, quarters=None):
+    # Merged top n pincodes of table over the given states / years / quarters (None = all).
+    # run_query is phonepe_db.run_query, so the sketches of a table sit in the result cache.
+    import pandas as pd
+
+    rows = run_query("SELECT states, years, quarter, sketch FROM pincode_sketch WHERE table_name = :table",
+                     {"table": table})
+    for column, values in (("states", states), ("years", years), ("quarter", quarters)):
+        if values is not None:
+            rows = rows[rows[column].isin(values)]
+    merged = merge_all(SpaceSaving.from_json(s) for s in rows["sketch"])
+    return pd.DataFrame(merged.top(n), columns=["pincodes", "total_value", "max_error", "total_txn"])
+
+
+# ---------------- Verification ----------------
+# Compares merged sketches with exact SQL: every exact total must lie in
+# [count - error, count], and the reported top n should match the exact one.
+# tests/test_sketch.py checks the same bounds offline on synthetic top lists.
+
+def verify(n=10):
+    import pandas as pd
+    from sqlalchemy import text
+    from phonepe_db import engine
+
+    def run_query(sql, params=None):
+        with engine.connect() as conn:
+            return pd.read_sql_query(text(sql), conn, params=params)
+
+    failures = 0
+    print(f"{'table':<16} {'scope':<24} {'recall':>7} {'max err %':>10} {'bounds':>7}")
+    for table, (measure, _) in SKETCH_TABLES.items():
+        years = sorted(run_query(f"SELECT DISTINCT years FROM {table}")["years"].tolist())
+        scopes = [("national, all periods", {}, "")]
+        scopes += [(f"national, {y}", {"years": [y]}, f"AND years = {int(y)}") for y in years[-2:]]
+        state = run_query(f"SELECT states FROM {table} GROUP BY states ORDER BY SUM({measure}) DESC LIMIT 1")["states"]
+        if not state.empty:
+            name = state.iloc[0].replace("'", "''")
+            scopes.append((f"{state.iloc[0]}, all periods", {"states": [state.iloc[0]]}, f"AND states = '{name}'"))
+        for label, scope, where in scopes:
+            sketch = top_pincodes(run_query, table, n, **scope)
+            exact = run_query(f"""SELECT pincodes, SUM({measure}) AS total
+                                  FROM {table}
+                                  WHERE pincodes IS NOT NULL {where}
+                                  GROUP BY pincodes""").set_index("pincodes")["total"]
+            truth = exact.reindex(sketch["pincodes"]).fillna(0).to_numpy(dtype=float)
+            count = sketch["total_value"].to_numpy(dtype=float)
+            error = sketch["max_error"].to_numpy(dtype=float)
+            in_bounds = bool(((count - error <= truth) & (truth <= count)).all())
+            recall = len(set(sketch["pincodes"]) & set(exact.nlargest(n).index)) / max(min(n, len(exact)), 1)
+            worst = float(((count - truth) / truth.clip(min=1)).max() * 100) if len(truth) else 0.0
+            print(f"{table:<16} {label[:24]:<24} {recall:>7.0%} {worst:>10.3f} {'ok' if in_bounds else 'FAIL':>7}")
+            failures += not in_bounds
+    return failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check the pincode sketches against exact SQL")
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+    raise SystemExit(1 if verify(args.top) else 0)
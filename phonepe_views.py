@@ -0,0 +1,468 @@
+#lib
+import numpy as np
+import pandas as pd
+import plotly.express as px
+
+from phonepe_sketch import top_pincodes
+from phonepe_semantic import plan, compile_query, order_terms, compile_grouping_sets, grouping_keys, grouping_id, sketch_source
+
+
+# ---------------- Scenario views ----------------
+# Every question of scenarios 1-5 as data: its semantic request, whether it
+# takes a year/quarter, and a build function that turns the query result into
+# the table and Plotly figure the dashboard shows. phonepe_app.py renders them,
+# phonepe_prerender.py renders them ahead of time after each ETL run.
+
+INDIA_GEOJSON_URL = "https://gist.githubusercontent.com/jbrobst/56c13bbbf9d97d187fea01ca62ea5112/raw/e388c4cae20aa53cb5090210a42ebb9b765c0a36/india_states.geojson"
+
+# State names as the India GeoJSON (properties.ST_NM) spells them
+GEO_STATE_NAMES = {
+    'Andaman & Nicobar': 'Andaman & Nicobar Islands',
+    'Dadra and Nagar Haveli and Daman and Diu': 'Dadra and Nagar Haveli and Daman and Diu',
+    'Jammu & Kashmir': 'Jammu and Kashmir',
+}
+
+
+def geo_state_name(state):
+    return GEO_STATE_NAMES.get(state, state)
+
+
+# The user registration map (Scenario 4-I) uses the older state spellings
+USER_MAP_STATE_NAMES = {
+    "Andaman & Nicobar": "Andaman & Nicobar Island",
+    "Dadra and Nagar Haveli and Daman and Diu": "Dadara & Nagar Havelli",
+    "Delhi": "NCT of Delhi",
+    "Odisha": "Orissa",
+    "Puducherry": "Pondicherry",
+}
+
+
+def add_period(df):
+    df['period'] = df['years'].astype(str) + ' Q' + df['quarter'].astype(str)
+    return df
+
+
+def state_bar(title, amount_label):
+    def build(df, **_):
+        fig = px.bar(
+            df,
+            x='states',
+            y='total_transaction_amount',
+            title=title,
+            labels={'total_transaction_amount': amount_label, 'states': 'States'},
+            hover_data=['total_transaction_count']
+        )
+        return df, fig
+    return build
+
+
+def quarter_bar(title, amount_label):
+    def build(df, **_):
+        df = add_period(df)
+        fig = px.bar(
+            df,
+            x='period',
+            y='total_transaction_amount',
+            title=title,
+            labels={'total_transaction_amount': amount_label, 'period': 'Quarter'},
+            hover_data=['total_transaction_count']
+        )
+        return df, fig
+    return build
+
+
+def category_bar(category, title, category_label, amount_label):
+    def build(df, **_):
+        fig = px.bar(
+            df,
+            x=category,
+            y='total_amount',
+            title=title,
+            labels={'total_amount': amount_label, category: category_label},
+            hover_data=['total_trans_count']
+        )
+        return df, fig
+    return build
+
+
+# ---------------- Trend charts ----------------
+# Multi-series trends grow with series x quarters. Above MAX_SERIES_POINTS a
+# series is downsampled with LTTB (Largest-Triangle-Three-Buckets), which keeps
+# the visual peaks and dips, and above WEBGL_POINTS the chart is drawn with
+# WebGL instead of SVG. Focusing a single series always shows it in full.
+
+MAX_SERIES_POINTS = 120
+WEBGL_POINTS = 1000
+
+
+def lttb(x, y, threshold):
+    # Indices of the points LTTB keeps, first and last always included
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    keep = [0]
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        nxt = slice(edges[i + 1], edges[i + 2] if i + 2 < len(edges) else n)
+        cx, cy = x[nxt].mean(), y[nxt].mean()
+        area = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a]))
+        a = lo + int(np.argmax(area))
+        keep.append(a)
+    keep.append(n - 1)
+    return np.array(keep)
+
+
+def downsample(df, series, y, threshold=MAX_SERIES_POINTS):
+    parts = []
+    for _, part in df.groupby(series, sort=False, observed=True):
+        if len(part) > threshold:
+            x = (part['years'] * 4 + part['quarter'] - 1).to_numpy(dtype=float)
+            part = part.iloc[lttb(x, part[y].to_numpy(dtype=float), threshold)]
+        parts.append(part)
+    return pd.concat(parts) if parts else df
+
+
+def trend_line(color, y, title, amount_label):
+    def build(df, focus=None, **_):
+        df = add_period(df)
+        if focus is not None:
+            df = df[df[color] == focus]
+            plot = df
+        else:
+            plot = downsample(df, color, y)
+        fig = px.line(
+            plot,
+            x='period',
+            y=y,
+            color=color,
+            title=title if focus is None else f"{title} - {focus}",
+            labels={y: amount_label, 'period': 'Quarter'},
+            # Downsampled series skip different quarters, keep the axis in time order
+            category_orders={'period': sorted(df['period'].unique())},
+            render_mode='webgl' if len(plot) > WEBGL_POINTS else 'auto',
+            markers=True
+        )
+        return df, fig
+    return build
+
+
+def top10_bar(key, title, key_label, value_label):
+    def build(df, **_):
+        fig = px.bar(
+            df,
+            x=key,
+            y='total_value',
+            title=title,
+            labels={'total_value': value_label, key: key_label},
+            hover_data=['total_txn']
+        )
+        return df, fig
+    return build
+
+
+def state_map(title, scale):
+    def build(df, geojson=None, **_):
+        df['state_clean'] = df['states'].map(geo_state_name)
+        df = df.dropna(subset=['state_clean'])
+        if df.empty:
+            return df, None
+        fig = px.choropleth(
+            df,
+            geojson=geojson,
+            featureidkey="properties.ST_NM",
+            locations="state_clean",
+            color="total_value",
+            color_continuous_scale=scale,
+            title=title.format(**_),
+            hover_data={"total_txn": True, "total_value": True}
+        )
+        fig.update_geos(fitbounds="locations", visible=False)
+        fig.update_layout(margin={"r": 0, "t": 50, "l": 0, "b": 0})
+        return df.head(10), fig
+    return build
+
+
+def user_state_map(df, geojson=None, year=None, quarter=None, **_):
+    df['state_clean'] = df['states'].map(lambda s: USER_MAP_STATE_NAMES.get(s, s))
+    df = df.dropna(subset=['state_clean'])
+    if df.empty:
+        return df, None
+
+    # Only the top 10 states get a colour, the others stay at 0
+    top10_states = df.nlargest(10, "total_users")["state_clean"].tolist()
+    df["highlight"] = df["total_users"].where(df["state_clean"].isin(top10_states), 0)
+
+    fig = px.choropleth(
+        df,
+        geojson=geojson,
+        featureidkey="properties.ST_NM",
+        locations="state_clean",
+        color="highlight",
+        color_continuous_scale="Blues",
+        title=f"Top 10 States by User Registrations (Year: {year}, Q{quarter})",
+        hover_data={"state_clean": True, "total_users": True}
+    )
+    fig.update_traces(marker_line_width=0.5, marker_line_color="black")
+    fig.update_geos(fitbounds="locations", visible=False)
+    fig.update_layout(margin={"r": 0, "t": 50, "l": 0, "b": 0})
+    return df[df["state_clean"].isin(top10_states)], fig
+
+
+def period_bar(key, y, title, key_label, value_label, chart_rows=None):
+    def build(df, year=None, quarter=None, **_):
+        if df.empty:
+            return df, None
+        fig = px.bar(
+            df.head(chart_rows) if chart_rows else df,
+            x=key,
+            y=y,
+            title=title.format(year=year, quarter=quarter),
+            labels={y: value_label, key: key_label},
+            text=y
+        )
+        fig.update_traces(textposition='outside')
+        fig.update_layout(xaxis_tickangle=-45)
+        return df.head(10), fig
+    return build
+
+
+# Each view's "query" is a semantic request (phonepe_semantic.py): model,
+# metrics {output column: metric}, dimensions, and optionally top_n and
+# order_by. Views with "periods" are filtered to the selected year/quarter.
+# The semantic layer picks the table, and decides whether the request is
+# answered by its scenario's GROUPING SETS scan or by pincode sketches.
+
+AMOUNT_AND_COUNT = {"total_transaction_count": "transaction_count", "total_transaction_amount": "transaction_amount"}
+VALUE_AND_TXN = {"total_txn": "transaction_count", "total_value": "transaction_amount"}
+
+VIEWS = {
+    # Scenario 1 - Decoding Transaction Dynamics on PhonePe
+    "s1_q1": {
+        "query": {"model": "transactions", "metrics": AMOUNT_AND_COUNT, "dimensions": ["states"],
+                  "order_by": ["-total_transaction_amount"]},
+        "build": state_bar('total transaction amount by State', 'Transaction amount (₹)'),
+    },
+    "s1_q2": {
+        "query": {"model": "transactions", "metrics": AMOUNT_AND_COUNT, "dimensions": ["years", "quarter"]},
+        "build": quarter_bar('total transaction amount by Quarter', 'Transaction amount (₹)'),
+    },
+    "s1_q3": {
+        "query": {"model": "transactions",
+                  "metrics": {"total_trans_count": "transaction_count", "total_amount": "transaction_amount"},
+                  "dimensions": ["transaction_type"], "order_by": ["-total_amount"]},
+        "build": category_bar('transaction_type', 'total transaction amount by Payment Category',
+                              'Payment Category', 'Transaction amount (₹)'),
+    },
+    "s1_q4": {
+        "query": {"model": "transactions", "metrics": {"total_amount": "transaction_amount"},
+                  "dimensions": ["states", "years", "quarter"]},
+        "build": trend_line('states', 'total_amount', 'Transaction Growth Trend Across States (Quarterly)',
+                            'Transaction amount (₹)'),
+    },
+    "s1_q5": {
+        "query": {"model": "transactions", "metrics": ["transaction_amount"],
+                  "dimensions": ["transaction_type", "years", "quarter"]},
+        "build": trend_line('transaction_type', 'transaction_amount', 'Transaction Trend by Payment Category Over Time',
+                            'Transaction amount (₹)'),
+    },
+
+    # Scenario 2 - Insurance Engagement Analysis
+    "s2_q1": {
+        "query": {"model": "insurance", "metrics": AMOUNT_AND_COUNT, "dimensions": ["states"],
+                  "order_by": ["-total_transaction_amount"]},
+        "build": state_bar('Total Insurance Transaction Amount by State', 'Transaction Amount (₹)'),
+    },
+    "s2_q2": {
+        "query": {"model": "insurance", "metrics": AMOUNT_AND_COUNT, "dimensions": ["years", "quarter"]},
+        "build": quarter_bar('Total Insurance Transaction Amount by Quarter', 'Transaction Amount (₹)'),
+    },
+    "s2_q3": {
+        "query": {"model": "insurance",
+                  "metrics": {"total_trans_count": "transaction_count", "total_amount": "transaction_amount"},
+                  "dimensions": ["insurance_type"], "order_by": ["-total_amount"]},
+        "build": category_bar('insurance_type', 'Total Insurance Transaction Amount by Type',
+                              'Insurance Type', 'Transaction Amount (₹)'),
+    },
+    "s2_q4": {
+        "query": {"model": "insurance", "metrics": {"total_amount": "transaction_amount"},
+                  "dimensions": ["states", "years", "quarter"]},
+        "build": trend_line('states', 'total_amount', 'Insurance Transaction Trend Across States (Quarterly)',
+                            'Transaction Amount (₹)'),
+    },
+    "s2_q5": {
+        "query": {"model": "insurance", "metrics": ["transaction_amount"],
+                  "dimensions": ["insurance_type", "years", "quarter"]},
+        "build": trend_line('insurance_type', 'transaction_amount', 'Insurance Transaction Trend by Type Over Time',
+                            'Transaction Amount (₹)'),
+    },
+
+    # Scenario 3 - Insurance Penetration and Growth Potential Analysis
+    "s3_q1": {
+        "map": True,
+        "query": {"model": "insurance", "metrics": VALUE_AND_TXN, "dimensions": ["states"],
+                  "order_by": ["-total_value", "-total_txn"]},
+        "build": state_map("Insurance Market Growth Across States", "Purples"),
+    },
+    "s3_q2": {
+        "query": {"model": "insurance", "metrics": VALUE_AND_TXN, "dimensions": ["districts"], "top_n": 10,
+                  "order_by": ["-total_value", "-total_txn"]},
+        "build": top10_bar('districts', 'Top 10 Districts by Insurance Value', 'District', 'Insurance Value (₹)'),
+    },
+    "s3_q3": {
+        "query": {"model": "insurance", "metrics": VALUE_AND_TXN, "dimensions": ["pincodes"], "top_n": 10,
+                  "order_by": ["-total_value", "-total_txn"]},
+        "build": top10_bar('pincodes', 'Top 10 Pincodes by Insurance Value', 'Pincode', 'Insurance Value (₹)'),
+    },
+
+    # Scenario 4 - User Registration Analysis
+    "s4_q1": {
+        "periods": True,
+        "map": True,
+        "query": {"model": "users", "metrics": {"total_users": "registered_users"}, "dimensions": ["states"],
+                  "order_by": ["-total_users"]},
+        "build": user_state_map,
+    },
+    "s4_q2": {
+        "periods": True,
+        "query": {"model": "users", "metrics": {"total_users": "registered_users"}, "dimensions": ["districts"],
+                  "order_by": ["-total_users"]},
+        "build": period_bar('districts', 'total_users', "Top 10 Districts by Registered Users ({year} Q{quarter})",
+                            'District', 'Registered Users'),
+    },
+    "s4_q3": {
+        "periods": True,
+        "query": {"model": "users", "metrics": {"total_users": "registered_users"}, "dimensions": ["pincodes"],
+                  "order_by": ["-total_users"]},
+        "build": period_bar('pincodes', 'total_users', "Top 10 Pincodes by Registered Users ({year} Q{quarter})",
+                            'Pincode', 'Registered Users'),
+    },
+
+    # Scenario 5 - Insurance Transactions Analysis
+    "s5_q1": {
+        "periods": True,
+        "map": True,
+        "query": {"model": "insurance", "metrics": VALUE_AND_TXN, "dimensions": ["states"],
+                  "order_by": ["-total_value", "-total_txn"]},
+        "build": state_map("Top 10 States by Insurance Transaction Value ({year}, Q{quarter})", "OrRd"),
+    },
+    "s5_q2": {
+        "periods": True,
+        "query": {"model": "insurance", "metrics": VALUE_AND_TXN, "dimensions": ["districts"],
+                  "order_by": ["-total_value", "-total_txn"]},
+        "build": period_bar('districts', 'total_value', "Top 10 Districts by Insurance Transaction Value ({year} Q{quarter})",
+                            'District', 'Total Transaction Value (₹)'),
+    },
+    "s5_q3": {
+        "periods": True,
+        "query": {"model": "insurance", "metrics": VALUE_AND_TXN, "dimensions": ["pincodes"], "top_n": 10,
+                  "order_by": ["-total_value", "-total_txn"]},
+        "build": period_bar('pincodes', 'total_value', "Top 10 Pincodes by Insurance Transaction Value ({year} Q{quarter})",
+                            'Pincode', 'Total Transaction Value (₹)'),
+    },
+}
+
+
+def view_request(view_id, year=None, quarter=None):
+    # Keyword arguments of phonepe_semantic.compile_query for the view
+    query = dict(VIEWS[view_id]["query"])
+    if VIEWS[view_id].get("periods"):
+        query["filters"] = {"years": year, "quarter": quarter}
+    return query
+
+
+def view_query(view_id, year=None, quarter=None, catalog=None):
+    # (sql, params) for phonepe_db.run_query
+    return compile_query(**view_request(view_id, year, quarter), catalog=catalog)
+
+
+def view_table(view_id, catalog=None):
+    query = view_request(view_id)
+    metrics = query["metrics"]
+    return plan(query["model"], list(metrics.values()) if isinstance(metrics, dict) else metrics,
+                query["dimensions"], query.get("filters"), catalog)["table"]
+
+
+def view_metrics(view_id):
+    metrics = VIEWS[view_id]["query"]["metrics"]
+    return metrics if isinstance(metrics, dict) else {m: m for m in metrics}
+
+
+# ---------------- Grouping sets ----------------
+# Scenarios 1 and 2 ask five questions of one table, each with its own GROUP BY.
+# A single GROUPING SETS scan computes all of them; the combined result is cached
+# once and split per question, so switching questions runs no further query.
+# Every unfiltered, untruncated view of these scenarios takes part.
+
+GROUPING_SCENARIOS = ("s1", "s2")
+
+
+def view_scenario(view_id):
+    return view_id.split("_")[0]
+
+
+def grouping_views(scenario):
+    if scenario not in GROUPING_SCENARIOS:
+        return []
+    return [v for v in VIEWS if view_scenario(v) == scenario
+            and not VIEWS[v].get("periods") and not VIEWS[v]["query"].get("top_n")]
+
+
+def grouping_requests(scenario):
+    return [(view_metrics(v), VIEWS[v]["query"]["dimensions"]) for v in grouping_views(scenario)]
+
+
+def grouping_query(scenario):
+    views = grouping_views(scenario)
+    return compile_grouping_sets(VIEWS[views[0]]["query"]["model"], grouping_requests(scenario))
+
+
+def split_grouping(view_id, combined):
+    query = VIEWS[view_id]["query"]
+    dimensions, metrics = query["dimensions"], view_metrics(view_id)
+    if combined.empty:
+        return pd.DataFrame(columns=dimensions + list(metrics))
+    keys = grouping_keys(grouping_requests(view_scenario(view_id)))
+    rows = combined[combined["grouping_id"] == grouping_id(keys, dimensions)]
+    df = rows[dimensions].copy()
+    for key in dimensions:
+        # Years/Quarter come back as float because the other grouping sets hold NULL there
+        if df[key].dtype.kind == "f":
+            df[key] = df[key].astype("int64")
+        elif isinstance(df[key].dtype, pd.CategoricalDtype):
+            df[key] = df[key].cat.remove_unused_categories()
+    for name, metric in metrics.items():
+        df[name] = rows[metric]
+    order = order_terms(metrics, dimensions, None, query.get("order_by"))
+    df = df.sort_values([c for c, _ in order], ascending=[not d for _, d in order])
+    return df.reset_index(drop=True)
+
+
+# ---------------- Pincode sketches ----------------
+# Top pincode views the semantic layer can answer from sketches are served by
+# merging the Space-Saving sketches the ETL keeps per state and quarter
+# (phonepe_sketch.py) instead of grouping the whole table. max_error bounds
+# how far the ranked metric may overstate a pincode's exact total.
+
+def view_sketch(view_id, year=None, quarter=None):
+    return sketch_source(**view_request(view_id, year, quarter))
+
+
+def sketch_frame(view_id, run_query, year=None, quarter=None):
+    source = view_sketch(view_id, year, quarter)
+    query = VIEWS[view_id]["query"]
+    years = [int(year)] if year is not None else None
+    quarters = [int(quarter)] if quarter is not None else None
+    df = top_pincodes(run_query, source["table"], query["top_n"], years=years, quarters=quarters)
+    columns = {"total_value": source["sketch"]["rank"], "total_txn": source["sketch"]["carry"]}
+    out = df[["pincodes"]].copy()
+    for name, metric in view_metrics(view_id).items():
+        out[name] = df[next(c for c, m in columns.items() if m == metric)]
+    out["max_error"] = df["max_error"]
+    return out
+
+
+def build_view(view_id, df, year=None, quarter=None, geojson=None, focus=None):
+    # focus: one series of a trend chart to show in full, ignored by other views
+    return VIEWS[view_id]["build"](df, year=year, quarter=quarter, geojson=geojson, focus=focus)
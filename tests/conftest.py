@@ -0,0 +1,2 @@
+def pytest_configure(config):
+    config.addinivalue_line("markers", "db: needs the loaded Pulse database (deselect with -m 'not db')")
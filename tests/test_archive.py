@@ -0,0 +1,62 @@
+import json
+import os
+
+import pytest
+
+from phonepe_archive import PulseArchive, pack
+
+TREE = {
+    "aggregated_transaction": "aggregated/transaction/country/india/state/",
+    "top_user": "top/user/country/india/state/",
+}
+
+
+def document(dataset, state, year, quarter):
+    return {"success": True, "data": {"dataset": dataset, "state": state, "year": year, "quarter": quarter,
+                                      "values": list(range(quarter))}}
+
+
+@pytest.fixture
+def archive(tmp_path):
+    # A small pulse/data tree, pretty printed like the real one
+    expected = {}
+    for dataset, rel_path in TREE.items():
+        for state in ["goa", "kerala"]:
+            for year in [2022, 2023]:
+                folder = tmp_path / "data" / rel_path / state / str(year)
+                folder.mkdir(parents=True)
+                for quarter in [1, 2, 3, 4]:
+                    doc = document(dataset, state, year, quarter)
+                    (folder / f"{quarter}.json").write_text(json.dumps(doc, indent=4))
+                    expected[(dataset, state, year, quarter)] = doc
+                (folder / "notes.txt").write_text("not a document")
+    path = tmp_path / "pulse.ppack"
+    count = pack(str(tmp_path / "data"), TREE, str(path))
+    assert count == len(expected)
+    assert not os.path.exists(str(path) + ".tmp")
+    return PulseArchive(str(path)), expected
+
+
+def test_read_single_key(archive):
+    packed, expected = archive
+    assert packed.read("top_user", "kerala", 2023, 3) == expected[("top_user", "kerala", 2023, 3)]
+    with pytest.raises(KeyError):
+        packed.read("top_user", "kerala", 2024, 1)
+
+
+def test_stream_whole_dataset(archive):
+    packed, expected = archive
+    assert sorted(packed.datasets()) == sorted(TREE)
+    for dataset in TREE:
+        streamed = list(packed.iter_documents(dataset))
+        assert [(s, y, q) for s, y, q, _ in streamed] == packed.entries(dataset)
+        assert {(dataset, s, y, q): doc for s, y, q, doc in streamed} == \
+            {k: v for k, v in expected.items() if k[0] == dataset}
+    assert list(packed.iter_documents("map_user")) == []
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / "other.bin"
+    path.write_bytes(b"\0" * 64)
+    with pytest.raises(ValueError):
+        PulseArchive(str(path))
@@ -0,0 +1,57 @@
+from decimal import Decimal
+
+import pytest
+
+pd = pytest.importorskip("pandas")
+pytest.importorskip("sqlalchemy")
+pytest.importorskip("psycopg2")
+
+import phonepe_export
+from phonepe_db import compact_series, read_compact
+
+
+def test_dimensions_become_categorical():
+    assert isinstance(compact_series(pd.Series([560001, 110001], name="pincodes")).dtype, pd.CategoricalDtype)
+    assert isinstance(compact_series(pd.Series(["Goa", "Goa", "Kerala"], name="label")).dtype, pd.CategoricalDtype)
+
+
+def test_decimal_sums_become_narrow_integers():
+    # SUM(bigint) arrives as Decimal objects
+    assert compact_series(pd.Series([Decimal(1), Decimal(200)], name="total")).dtype == "int16"
+    big = compact_series(pd.Series([Decimal(10) ** 12, Decimal(1)], name="total"))
+    assert big.dtype == "int64"
+    assert big.iloc[0] == 10 ** 12
+
+
+def test_integers_narrow():
+    assert compact_series(pd.Series([-5, 100], name="n")).dtype == "int8"
+    assert compact_series(pd.Series([0, 70000], name="n")).dtype == "int32"
+
+
+def test_float32_only_on_exact_round_trip():
+    exact = compact_series(pd.Series([0.5, 0.25, float("nan")], name="share"))
+    assert exact.dtype == "float32"
+    inexact = compact_series(pd.Series([0.1, 0.25], name="share"))
+    assert inexact.dtype == "float64"
+    assert inexact.iloc[0] == 0.1
+    # Whole-valued floats are integers
+    assert compact_series(pd.Series([1.0, 2.0], name="n")).dtype.kind in "iu"
+
+
+def test_chunks_merge(monkeypatch):
+    def fake_stream(sql, params=None, chunk_rows=None, conn=None):
+        yield ["states", "years", "total_amount", "share"]
+        yield [("Goa", 2022, Decimal(5), 0.5), ("Kerala", 2022, Decimal(7), 0.25)]
+        yield [("Bihar", 2023, Decimal(10) ** 10, 0.1)]
+
+    monkeypatch.setattr(phonepe_export, "stream_rows", fake_stream)
+    df = read_compact("SELECT 1", chunk_rows=2)
+
+    assert list(df.columns) == ["states", "years", "total_amount", "share"]
+    assert isinstance(df["states"].dtype, pd.CategoricalDtype)
+    assert list(df["states"]) == ["Goa", "Kerala", "Bihar"]
+    assert set(df["states"].cat.categories) == {"Goa", "Kerala", "Bihar"}
+    # The second chunk needs a wider integer and full float precision
+    assert df["total_amount"].iloc[2] == 10 ** 10
+    assert df["share"].dtype == "float64" and df["share"].iloc[2] == 0.1
+    assert df["years"].dtype == "int16"
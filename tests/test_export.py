@@ -0,0 +1,71 @@
+import csv
+from collections import namedtuple
+from decimal import Decimal
+
+import pytest
+
+pytest.importorskip("sqlalchemy")
+pytest.importorskip("psycopg2")
+pq = pytest.importorskip("pyarrow.parquet")
+
+import phonepe_export
+
+# psycopg2's cursor.description entries
+Column = namedtuple("Column", "name type_code display_size internal_size precision scale null_ok")
+
+DESCRIPTION = [
+    Column("states", 1043, None, 255, None, None, None),
+    Column("years", 23, None, 4, None, None, None),
+    Column("total_amount", 1700, None, None, None, None, None),   # SUM(bigint)
+    Column("share", 701, None, 8, None, None, None),
+    Column("note", 25, None, None, None, None, None),
+]
+
+CHUNKS = [
+    # Small sums and a column that is NULL throughout the first chunk
+    [("Goa", 2022, Decimal(3), 0.5, None), ("Kerala", 2022, Decimal(7), None, None)],
+    [("Bihar", 2023, Decimal("12345678901234"), 0.25, "late"), ("Assam", 2023, None, 0.1, None)],
+    [("Sikkim", 2024, Decimal("98765432109876543"), 1.0, "x")],
+]
+
+
+@pytest.fixture
+def fake_stream(monkeypatch):
+    def stream_rows(sql, params=None, chunk_rows=None, conn=None, describe=False):
+        yield DESCRIPTION if describe else [c.name for c in DESCRIPTION]
+        yield from CHUNKS
+
+    monkeypatch.setattr(phonepe_export, "stream_rows", stream_rows)
+
+
+def test_parquet_export_spans_chunks(fake_stream, tmp_path):
+    path = tmp_path / "out.parquet"
+    rows = phonepe_export.export_parquet("SELECT 1", str(path), chunk_rows=2)
+
+    table = pq.read_table(path)
+    assert rows == table.num_rows == 5
+    assert pq.ParquetFile(path).num_row_groups == len(CHUNKS)
+    assert table.column_names == [c.name for c in DESCRIPTION]
+    assert table.column("total_amount").to_pylist() == [3.0, 7.0, 12345678901234.0, None, 98765432109876543.0]
+    assert table.column("note").to_pylist() == [None, None, "late", None, "x"]
+    assert table.column("share").to_pylist() == [0.5, None, 0.25, 0.1, 1.0]
+    assert table.column("years").to_pylist() == [2022, 2022, 2023, 2023, 2024]
+
+
+def test_parquet_export_empty_result(monkeypatch, tmp_path):
+    def stream_rows(sql, params=None, chunk_rows=None, conn=None, describe=False):
+        yield DESCRIPTION
+
+    monkeypatch.setattr(phonepe_export, "stream_rows", stream_rows)
+    path = tmp_path / "empty.parquet"
+    assert phonepe_export.export_parquet("SELECT 1", str(path)) == 0
+    assert pq.read_table(path).column_names == [c.name for c in DESCRIPTION]
+
+
+def test_csv_export_spans_chunks(fake_stream, tmp_path):
+    path = tmp_path / "out.csv"
+    assert phonepe_export.export_csv("SELECT 1", str(path), chunk_rows=2) == 5
+    with open(path, newline="", encoding="utf-8") as f:
+        lines = list(csv.reader(f))
+    assert lines[0] == [c.name for c in DESCRIPTION]
+    assert lines[3][2] == "12345678901234"
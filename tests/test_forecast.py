@@ -0,0 +1,42 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("pandas")
+
+from phonepe_forecast import MIN_POINTS, fit_forecast, period_index
+
+
+def log_linear(t, t0, a, b, seasonal):
+    # The model itself: log1p(y) = a + b * years since t0 + quarter-of-year effect
+    return np.expm1(a + b * (t - t0) / 4.0 + np.asarray(seasonal)[t % 4])
+
+
+def test_recovers_log_linear_trend_across_a_gap():
+    t = np.arange(period_index(2019, 1), period_index(2024, 4) + 1)
+    Y = np.vstack([
+        log_linear(t, t[0], 10.0, 0.3, [0.0, 0.1, -0.05, 0.2]),
+        log_linear(t, t[0], 5.0, -0.2, [0.0, 0.0, 0.0, 0.0]),
+    ])
+    # Second series misses a year in the middle: the weight mask drops those quarters
+    Y[1, 8:12] = np.nan
+
+    t_future, forecast, lower, upper = fit_forecast(Y, t, horizon=2)
+
+    assert list(t_future) == [t[-1] + 1, t[-1] + 2]
+    expected = np.vstack([
+        log_linear(t_future, t[0], 10.0, 0.3, [0.0, 0.1, -0.05, 0.2]),
+        log_linear(t_future, t[0], 5.0, -0.2, [0.0, 0.0, 0.0, 0.0]),
+    ])
+    np.testing.assert_allclose(forecast, expected, rtol=1e-4)
+    assert (lower <= forecast + 1e-6).all() and (forecast <= upper + 1e-6).all()
+
+
+def test_short_series_are_not_forecast():
+    t = np.arange(period_index(2022, 1), period_index(2023, 4) + 1)
+    Y = np.vstack([log_linear(t, t[0], 8.0, 0.1, [0.0] * 4)] * 2)
+    Y[1, :len(t) - MIN_POINTS + 1] = np.nan
+
+    _, forecast, lower, upper = fit_forecast(Y, t)
+
+    assert np.isfinite(forecast[0]).all()
+    assert np.isnan(forecast[1]).all() and np.isnan(lower[1]).all() and np.isnan(upper[1]).all()
@@ -0,0 +1,33 @@
+import pytest
+
+pytest.importorskip("numpy")
+
+import phonepe_geo
+from phonepe_geo import district_key, geo_key, match_districts
+
+
+def test_renamed_districts_use_the_boundary_name():
+    assert district_key("Bengaluru Urban") == geo_key("Bangalore Urban")
+    assert district_key("Y.S.R. District") == geo_key("Cuddapah")
+    assert district_key("Goa North") == geo_key("Goa North")
+
+
+def test_unmatched_districts_are_logged(caplog):
+    geojson = {"features": [{"properties": {"key": geo_key("Mysore")}}]}
+    keys = match_districts("Karnataka", ["Mysuru", "Vijayanagara"], geojson)
+    assert keys == ["mysore", "vijayanagara"]
+    assert "Vijayanagara" in caplog.text and "Mysuru" not in caplog.text
+
+
+def test_split_states_read_their_old_state(tmp_path, monkeypatch):
+    square = [[[0, 0], [1, 0], [1, 1], [0, 1], [0, 0]]]
+    source = {"features": [
+        {"properties": {"NAME_1": "Andhra Pradesh", "NAME_2": "Hyderabad"},
+         "geometry": {"type": "Polygon", "coordinates": square}},
+    ]}
+    monkeypatch.setattr(phonepe_geo, "GEOMETRY_DIR", str(tmp_path))
+    phonepe_geo._state_geojson.cache_clear()
+    assert phonepe_geo.build(source) == 1
+    geojson = phonepe_geo.district_geojson("Telangana")
+    assert [f["properties"]["key"] for f in geojson["features"]] == ["hyderabad"]
+    assert phonepe_geo.district_geojson("Ladakh") is None
@@ -0,0 +1,23 @@
+import pytest
+
+psycopg2 = pytest.importorskip("psycopg2")
+pytest.importorskip("pandas")
+
+import phonepe_etl
+
+pytestmark = pytest.mark.db
+
+
+@pytest.fixture(scope="module")
+def live_db():
+    try:
+        conn = phonepe_etl.get_connection(phonepe_etl.LIVE_SCHEMA)
+    except psycopg2.OperationalError as exc:
+        pytest.skip(f"database unavailable: {exc}")
+    conn.close()
+
+
+def test_period_queries_touch_one_partition(live_db):
+    # Every dataset scan and period view for the latest quarter must plan
+    # against that year's partition only
+    assert phonepe_etl.check_partitions() == []
@@ -0,0 +1,70 @@
+import random
+from collections import Counter
+
+import pytest
+
+from phonepe_sketch import SpaceSaving, merge_all
+
+
+def top_lists(seed, states=12, quarters=8, per_list=10, pincodes=60):
+    # Per-(state, quarter) top pincode lists with skewed totals, plus the exact national totals
+    rng = random.Random(seed)
+    lists, exact = [], Counter()
+    for _ in range(states * quarters):
+        chosen = rng.sample(range(pincodes), per_list)
+        rows = [(560000 + p, int(rng.paretovariate(1.2) * 1000), rng.randint(1, 500)) for p in chosen]
+        lists.append(rows)
+        for pincode, value, _ in rows:
+            exact[pincode] += value
+    return lists, exact
+
+
+def sketches(lists, k):
+    out = []
+    for rows in lists:
+        sketch = SpaceSaving(k)
+        for pincode, value, txn in rows:
+            sketch.update(pincode, value, txn)
+        out.append(sketch)
+    return out
+
+
+def assert_bounds(merged, exact):
+    for pincode, count, error, _ in merged.top(merged.k):
+        assert count - error <= exact[pincode] <= count, pincode
+
+
+@pytest.mark.parametrize("seed", range(20))
+@pytest.mark.parametrize("k", [4, 8, 16])
+def test_merged_bounds_hold_under_truncation(seed, k):
+    lists, exact = top_lists(seed)
+    merged = merge_all(sketches(lists, k), k)
+    assert len(merged.counters) == k
+    # Truncation happened, so the bounds are actually exercised
+    assert any(error > 0 for _, _, error, _ in merged.top(k))
+    assert_bounds(merged, exact)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_merge_order_does_not_break_bounds(seed):
+    lists, exact = top_lists(seed)
+    parts = sketches(lists, 8)
+    random.Random(seed).shuffle(parts)
+    # Tree-shaped merge, like merging per-state results first
+    while len(parts) > 1:
+        parts = [parts[i].merge(parts[i + 1]) if i + 1 < len(parts) else parts[i] for i in range(0, len(parts), 2)]
+    assert_bounds(parts[0], exact)
+
+
+def test_large_k_is_exact():
+    lists, exact = top_lists(0)
+    merged = merge_all(sketches(lists, 64), 64)
+    top = merged.top(10)
+    assert all(error == 0 for _, _, error, _ in top)
+    assert [count for _, count, _, _ in top] == sorted(exact.values(), reverse=True)[:10]
+
+
+def test_json_round_trip():
+    lists, _ = top_lists(1)
+    sketch = sketches(lists, 8)[0]
+    assert SpaceSaving.from_json(sketch.to_json()).counters == sketch.counters
@@ -0,0 +1,67 @@
+import itertools
+
+import pytest
+
+pd = pytest.importorskip("pandas")
+pytest.importorskip("plotly")
+
+from phonepe_semantic import grouping_keys, grouping_id, order_terms
+from phonepe_views import (VIEWS, GROUPING_SCENARIOS, view_scenario, view_metrics, grouping_views,
+                           grouping_requests, grouping_query, split_grouping, view_query)
+
+GROUPING_VIEWS = [v for s in GROUPING_SCENARIOS for v in grouping_views(s)]
+
+SAMPLE_VALUES = {
+    "states": ["Goa", "Kerala"],
+    "years": [2022, 2023],
+    "quarter": [1, 2],
+    "transaction_type": ["Peer-to-peer payments", "Merchant payments"],
+    "insurance_type": ["Insurance"],
+}
+
+
+def combined_frame(scenario):
+    # What grouping_query returns: one block of rows per grouping set, NULL in the keys it does not group by
+    requests = grouping_requests(scenario)
+    keys = grouping_keys(requests)
+    rows = []
+    for metrics, dimensions in requests:
+        for n, values in enumerate(itertools.product(*(SAMPLE_VALUES[k] for k in dimensions))):
+            row = {k: None for k in keys}
+            row.update(zip(dimensions, values))
+            row.update(grouping_id=grouping_id(keys, dimensions), transaction_count=n + 1,
+                       transaction_amount=(n + 1) * 100)
+            rows.append(row)
+    return pd.DataFrame(rows)
+
+
+@pytest.mark.parametrize("view_id", list(VIEWS))
+def test_view_order_uses_view_columns(view_id):
+    query = VIEWS[view_id]["query"]
+    metrics = view_metrics(view_id)
+    order = order_terms(metrics, query["dimensions"], query.get("top_n"), query.get("order_by"))
+    assert {c for c, _ in order} <= set(query["dimensions"]) | set(metrics)
+
+
+@pytest.mark.parametrize("view_id", list(VIEWS))
+def test_view_compiles(view_id):
+    sql, params = view_query(view_id, 2023, 1)
+    assert sql.strip().startswith("SELECT")
+    if VIEWS[view_id].get("periods"):
+        assert params == {"years": 2023, "quarter": 1}
+
+
+@pytest.mark.parametrize("scenario", GROUPING_SCENARIOS)
+def test_grouping_query_covers_every_view(scenario):
+    sql, _ = grouping_query(scenario)
+    for _, dimensions in grouping_requests(scenario):
+        assert "(" + ", ".join(dimensions) + ")" in sql
+
+
+@pytest.mark.parametrize("view_id", GROUPING_VIEWS)
+def test_split_grouping(view_id):
+    query = VIEWS[view_id]["query"]
+    df = split_grouping(view_id, combined_frame(view_scenario(view_id)))
+    assert list(df.columns) == query["dimensions"] + list(view_metrics(view_id))
+    assert len(df) == len(list(itertools.product(*(SAMPLE_VALUES[k] for k in query["dimensions"]))))
+    assert df[query["dimensions"]].notna().all().all()